@@ -1,6 +1,25 @@
 import math
 import json
 import os
+from dataclasses import dataclass
+
+import numpy as np
+
+import chart_registry
+
+
+def chart_file_path(layer_type, supported_sides, nfl_or_cof, interlayer, base_dir="./Json"):
+    """
+    Build the path and the top-level key of a 1- or 2-sided chart file.
+
+    Returns:
+        tuple: The file path, e.g. './Json/COF/mono/COF_1_mono_PVB.json', and the top-level key.
+    """
+    if nfl_or_cof == "NFL":
+        name = f"{nfl_or_cof}_{supported_sides}_{layer_type}"  # Example: 'NFL_1_mono'
+    else:
+        name = f"{nfl_or_cof}_{supported_sides}_{layer_type}_{interlayer}"  # Example: 'COF_1_mono_PVB'
+    return os.path.join(base_dir, nfl_or_cof, layer_type, f"{name}.json"), name
 
 
 def load_json_file(layer_type, supported_sides, nfl_or_cof, interlayerType, base_dir="./Json"):
@@ -19,37 +38,90 @@ def load_json_file(layer_type, supported_sides, nfl_or_cof, interlayerType, base
 
     if not interlayerType:
         interlayerType.append("PVB")
-    # Build the file path based on the parameters
-    if nfl_or_cof == "NFL":
-        file_path = os.path.join(
-            base_dir,
-            nfl_or_cof,
-            layer_type,
-            f"{nfl_or_cof}_{supported_sides}_{layer_type}.json"  # Example: 'NFL_1_mono.json'
-        )
-    elif nfl_or_cof == "COF":
-        file_path = os.path.join(
-            base_dir,
-            nfl_or_cof,
-            layer_type,
-            f"{nfl_or_cof}_{supported_sides}_{layer_type}_{interlayerType[0]}.json"  # Example: 'COF_1_mono_PVB.json'
-        )
-
-
+    file_path, top_level_key = chart_file_path(layer_type, supported_sides, nfl_or_cof, interlayerType[0], base_dir)
 
     try:
         # Load the JSON data from the file
-        with open(file_path, 'r') as f:
-            data = json.load(f)
+        data = chart_registry.read_json(file_path)
 
         # Return the dictionary inside the top-level key
+        return data.get(top_level_key, f"Top-level key '{top_level_key}' not found in the JSON file.")
+
+    except FileNotFoundError:
+        return f"File not found: {file_path}"
+    except json.JSONDecodeError:
+        return "Error decoding JSON file."
+
+
+# The 1- and 2-sided charts are straight lines on log-log axes between two points (x1, y1), (x2, y2) per thickness:
+#   NFL: ln(NFL) = intercept + slope * ln(length)                 (x = NFL, y = length in mm)
+#   COF: ln(COF) = intercept + slope * ln(length^4 * load)        (x = load * length^4 in m, y = COF)
+# SGP interlayers use the PVB chart with the COF scaled by 0.3, which is folded into the intercept.
+SGP_COF_FACTOR = 0.3
+_MM4_TO_M4 = math.log(1e-12)
+
+
+@dataclass(frozen=True)
+class LogCurve:
+    """
+    Precompiled log-log line of one thickness of a 1- or 2-sided chart.
+
+    Attributes:
+        intercept (float): ln of the value where the curve variable is 1, NaN if the chart has no valid line.
+        slope (float): Slope against the log of the curve variable.
+        error (str): The error message of an invalid line, None otherwise.
+    """
+    intercept: float
+    slope: float
+    error: str = None
+
+
+def _compile_curve(points, nfl_or_cof, scale):
+    if not points or len(points) != 2:
+        return LogCurve(math.nan, math.nan, "Invalid data or number of points for interpolation.")
+    (x1, y1), (x2, y2) = points
+
+    try:
         if nfl_or_cof == "NFL":
-            top_level_key = f"{nfl_or_cof}_{supported_sides}_{layer_type}"
-        else:
-            top_level_key = f"{nfl_or_cof}_{supported_sides}_{layer_type}_{interlayerType[0]}"
+            if y1 == y2:
+                return LogCurve(math.nan, math.nan, "Length values y1 and y2 cannot be the same.")
+            slope = math.log(x2 / x1) / math.log(y2 / y1)
+            return LogCurve(math.log(x1) - slope * math.log(y1), slope)
+
+        slope = (math.log(y2) - math.log(y1)) / (math.log(x2) - math.log(x1))
+        return LogCurve(math.log(y1 * scale) - slope * (math.log(x1) - _MM4_TO_M4), slope)
+    except (ValueError, ZeroDivisionError) as e:
+        return LogCurve(math.nan, math.nan, f"Error in calculation: {str(e)}")
 
-        return data.get(top_level_key, f"Top-level key '{top_level_key}' not found in the JSON file.")
 
+def get_log_curves(layer_type, supported_sides, nfl_or_cof, interlayerTypes, base_dir="./Json"):
+    """
+    Get the precompiled curves of a 1- or 2-sided chart, built once per version of the chart file.
+
+    Args:
+        layer_type (str): Either "mono" or "laminated".
+        supported_sides (str): Number of supported sides, usually "1" or "2".
+        nfl_or_cof (str): Indicates whether to load NFL or COF data.
+        interlayerTypes (list): The interlayer types, ["SGP"] selects the SGP curves.
+        base_dir (str): Base directory where the JSON files are located.
+
+    Returns:
+        dict or str: Thickness key (as in the chart, e.g. '6') -> LogCurve, or an error message.
+    """
+    sgp = bool(interlayerTypes) and interlayerTypes[0] == "SGP"
+    # SGP reads the PVB chart, as find_load_for_given_length always did
+    interlayer = "PVB" if sgp or not interlayerTypes else interlayerTypes[0]
+    file_path, top_level_key = chart_file_path(layer_type, supported_sides, nfl_or_cof, interlayer, base_dir)
+    scale = SGP_COF_FACTOR if sgp and nfl_or_cof == "COF" else 1.0
+
+    def build(data):
+        if top_level_key not in data:
+            return f"Top-level key '{top_level_key}' not found in the JSON file."
+        return {str(thickness): _compile_curve(points, nfl_or_cof, scale)
+                for thickness, points in data[top_level_key].items()}
+
+    try:
+        return chart_registry.registry.derived(file_path, f"log_curves_{scale}", build)
     except FileNotFoundError:
         return f"File not found: {file_path}"
     except json.JSONDecodeError:
@@ -71,55 +143,70 @@ def find_load_for_given_length(thickness, length, layer_type, supported_sides, n
     Returns:
         float or str: Calculated load or deflection, or an error message.
     """
-    # Load the correct JSON data
-    if interlayerTypes and interlayerTypes[0] == "SGP":
-        points_dict = load_json_file(layer_type, supported_sides, nfl_or_cof, ["PVB"])
-    else:
-        points_dict = load_json_file(layer_type, supported_sides, nfl_or_cof, interlayerTypes)
+    if not interlayerTypes and isinstance(interlayerTypes, list):
+        interlayerTypes.append("PVB")
+    curves = get_log_curves(layer_type, supported_sides, nfl_or_cof, interlayerTypes)
 
     # Check if the data is loaded correctly
-    if isinstance(points_dict, str):
-        return points_dict  # Return the error message
+    if isinstance(curves, str):
+        return curves  # Return the error message
     if nfl_or_cof == "NFL" and thickness > 19:
         thickness = 19
-    # Check if the thickness exists in the points_dict
-    points = points_dict.get(str(thickness))
-    if not points or len(points) != 2:
+    # Check if the thickness exists in the chart
+    curve = curves.get(str(thickness))
+    if curve is None:
         return "Invalid data or number of points for interpolation."
-
-    # Extract points (x1, y1) and (x2, y2)
-    (x1, y1), (x2, y2) = points
+    if curve.error:
+        return curve.error
 
     try:
         if nfl_or_cof == "NFL":
-            if y1 != y2:
-                # Logarithmic interpolation for NFL
-                x = x1 * (x2 / x1) ** (math.log(length / y1) / math.log(y2 / y1))
-                return round(x, 5)
-            else:
-                return "Length values y1 and y2 cannot be the same."
+            return round(math.exp(curve.intercept + curve.slope * math.log(length)), 5)
         else:  # For COF calculation
-            length_m = length / 1000  # Convert length from mm to meters
-            length_m **= 4  # Raise length to the fourth power
-            load_l4 = length_m * load
-
-            # Log-log interpolation
-            log_x1 = math.log10(x1)
-            log_x2 = math.log10(x2)
-            log_y1 = math.log10(y1)
-            log_y2 = math.log10(y2)
-            log_load_l4 = math.log10(load_l4)
-
-            log_y = log_y1 + ((log_load_l4 - log_x1) / (log_x2 - log_x1)) * (log_y2 - log_y1)
-            y = 10 ** log_y  # Convert back from logarithmic scale
-            if interlayerTypes[0] == "SGP":
-                y *= 0.3
-            return round(y, 5)
-
+            return round(math.exp(curve.intercept + curve.slope * math.log(length ** 4 * load)), 5)
     except ValueError as e:
         return f"Error in calculation: {str(e)}"
 
 
+def evaluate_1_2_sided(thickness, lengths, layer_type, supported_sides, nfl_or_cof, loads=0, interlayerTypes=None):
+    """
+    Vectorized form of find_load_for_given_length for many lengths (and loads) of one build-up.
+
+    Args:
+        thickness (int): Glass thickness.
+        lengths (array-like): Lengths of the glass in mm.
+        layer_type (str): Either "mono" or "laminated".
+        supported_sides (str): Number of supported sides, usually "1" or "2".
+        nfl_or_cof (str): Indicates whether to evaluate NFL or COF data.
+        loads (array-like): The loads of the COF, broadcast against lengths.
+        interlayerTypes (list, optional): The interlayer types, PVB by default.
+
+    Returns:
+        np.ndarray: The NFL or COF rounded to 5 decimals, NaN where find_load_for_given_length would
+                    return a calculation error.
+
+    Raises:
+        ValueError: With the message find_load_for_given_length returns when the chart or thickness is missing.
+    """
+    curves = get_log_curves(layer_type, supported_sides, nfl_or_cof, interlayerTypes or ["PVB"])
+    if isinstance(curves, str):
+        raise ValueError(curves)
+    if nfl_or_cof == "NFL" and thickness > 19:
+        thickness = 19
+    curve = curves.get(str(thickness))
+    if curve is None or curve.error:
+        raise ValueError(curve.error if curve else "Invalid data or number of points for interpolation.")
+
+    lengths = np.asarray(lengths, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if nfl_or_cof == "NFL":
+            variable = np.log(np.where(lengths > 0, lengths, np.nan))
+        else:
+            variable = lengths ** 4 * np.asarray(loads, dtype=float)
+            variable = np.log(np.where(variable > 0, variable, np.nan))
+        return np.round(np.exp(curve.intercept + curve.slope * variable), 5)
+
+
 # Example usage:
 if __name__ == "__main__":
     thickness = 12
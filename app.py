@@ -1,19 +1,203 @@
 import os
 import io
-from flask import Flask, jsonify, render_template, request, send_file, url_for
-from nfl_calculation import calculate_nfl
-from get_gtf import get_gtf_value
-from lr_calculation import calculate_lr
-from cof_calculation import calculate_cof
-from pdf_creation import create_pdf
-from newPlotting import plot_nfl_from_json
-from glass_weight import calculate_glass_weight
-from get_load_share_factor import get_load_share_factor
-from NFL_COF_1and2Sided import find_load_for_given_length
-from cof_recommendation import find_correct_thickness
+import json
+import time
+import logging
+from flask import (Flask, Response, g, jsonify, render_template, request, send_file, send_from_directory,
+                   stream_with_context, url_for)
+from panel_calculation import calculate_panel, render_plots, render_report, CalculationError
+from nfl_calculation import build_interpolators
+from newPlotting import build_plot_templates
+import chart_registry
+import report_jobs
+import artifacts
+import result_cache
+import timing
+import profiler
 
 app = Flask(__name__)
 
+REPORT_FILENAME = "deflection_result.pdf"
+
+if timing.TIMING_ENABLED:
+    # The per-request timing lines are logged at INFO
+    app.logger.setLevel(logging.INFO)
+
+# Panel calculated and rendered by warm_up() to load the plotting and PDF code paths
+WARM_UP_PANEL = {
+    'shortDurationLoad': 1.5,
+    'longDurationLoad': 0,
+    'allowable_Deflection': 20,
+    'glassLength': 2000,
+    'glassWidth': 1200,
+    'numberOfSupportedSides': 4,
+    'glazingType': 'single',
+    'layersTypes': ['mono'],
+    'layersThicknesses': [6],
+    'glassLayersStrengthType': ['tempered'],
+    'pvbThicknesses': [],
+    'interlayerTypes': ['PVB'],
+    'airGap': 0,
+}
+
+_warmed_up = False
+
+
+def warm_up():
+    """
+    Pay the one-off costs of a fresh process before the first request.
+
+    Parses every chart, builds the NFL interpolators, chart indexes and plot templates, then
+    calculates one panel and renders its plot and PDF report so the plotting and reportlab code
+    and fonts are loaded. With gunicorn's preload_app this runs once in the master process and the
+    workers share the result copy-on-write.
+
+    Returns:
+        bool: True if the warm-up ran, False if this process was already warmed up.
+    """
+    global _warmed_up
+    if _warmed_up:
+        return False
+
+    chart_registry.preload()
+    build_interpolators()
+    build_plot_templates()
+
+    try:
+        results = calculate_panel(WARM_UP_PANEL)
+        render_plots(WARM_UP_PANEL, results)
+        render_report_bytes(WARM_UP_PANEL, [], results)
+    except Exception:
+        # A failed warm-up only costs the first request its speed
+        app.logger.exception("Warm-up render failed")
+
+    _warmed_up = True
+    return True
+
+
+def create_app(warm=True):
+    """
+    Application factory, e.g. ``gunicorn 'app:create_app()'``.
+
+    Args:
+        warm (bool): Run warm_up() before returning the application.
+
+    Returns:
+        Flask: The application.
+    """
+    if warm:
+        warm_up()
+    return app
+
+
+# Endpoints whose requests the sampling profiler may pick
+PROFILED_ENDPOINTS = ('calculate', 'calculate_batch')
+
+
+@app.before_request
+def start_timing():
+    if timing.enabled():
+        g.timing_token = timing.start_request()
+        g.request_start = time.perf_counter()
+
+
+@app.before_request
+def start_profiling():
+    if profiler.ENABLED and request.endpoint in PROFILED_ENDPOINTS:
+        g.profiler_token = profiler.start(request.endpoint)
+
+
+@app.teardown_request
+def stop_profiling(exception=None):
+    profiler.stop(g.pop('profiler_token', None))
+
+
+def record_request_timing(spans, start, endpoint, method, path, status):
+    """
+    Record the total time of a request and log its stage timings as a structured log line.
+
+    Returns:
+        OrderedDict: The spans, with the total added when timing is enabled.
+    """
+    total = time.perf_counter() - start
+    timing.record(f"request:{endpoint}", total)
+
+    if timing.TIMING_ENABLED:
+        spans['total'] = total
+        app.logger.info(json.dumps({'event': 'request_timing', 'method': method, 'path': path, 'status': status,
+                                    'spans_ms': {name: round(seconds * 1000, 3) for name, seconds in spans.items()}}))
+    return spans
+
+
+@app.after_request
+def finish_timing(response):
+    """
+    Send the stage timings of the request as a Server-Timing header and a structured log line.
+
+    Streamed responses (see timed_stream) are skipped: their body is produced after this hook, so they
+    record and log their timings themselves once the last chunk is sent, without a Server-Timing header.
+    """
+    token = g.pop('timing_token', None)
+    if token is None:
+        return response
+
+    spans = timing.finish_request(token)
+    if g.pop('timing_streamed', False):
+        return response
+
+    spans = record_request_timing(spans, g.pop('request_start'), request.endpoint, request.method, request.path,
+                                  response.status_code)
+    if timing.TIMING_ENABLED:
+        response.headers['Server-Timing'] = timing.server_timing_header(spans)
+    return response
+
+
+def timed_stream(chunks):
+    """
+    Wrap the chunks of a streamed response so that the spans recorded while producing them are collected,
+    and recorded and logged like those of any other request after the last chunk.
+    """
+    if 'timing_token' not in g:
+        return chunks
+
+    g.timing_streamed = True
+    start = g.request_start
+    endpoint, method, path = request.endpoint, request.method, request.path
+
+    def generate():
+        token = timing.start_request()
+        try:
+            yield from chunks
+        finally:
+            record_request_timing(timing.finish_request(token), start, endpoint, method, path, 200)
+
+    return generate()
+
+
+@app.route('/admin/profile')
+def admin_profile():
+    """
+    Collapsed call stacks sampled by the profiler, e.g. for flamegraph.pl or speedscope.
+
+    Requires the PROFILER_TOKEN as a bearer token; ?reset=1 clears the stacks after reading them.
+    """
+    if not profiler.ENABLED:
+        return jsonify({"error": "Not found"}), 404
+
+    authorization = request.headers.get('Authorization', '')
+    token = authorization[len('Bearer '):] if authorization.startswith('Bearer ') else ''
+    if not profiler.check_token(token):
+        return jsonify({"error": "Forbidden"}), 403
+
+    return Response(profiler.sampler.collapsed(reset=request.args.get('reset') == '1'), mimetype='text/plain')
+
+
+@app.route('/metrics')
+def metrics():
+    if not timing.METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(timing.render_metrics(), mimetype='text/plain; version=0.0.4')
+
 
 @app.route('/')
 def home():
@@ -34,189 +218,215 @@ def calculate():
     if not isinstance(input_data, dict):
         return jsonify({"error": "Invalid data format"}), 400
 
-    modulus_of_elasticity = 71700000
-    shortDurationLoad = input_data.get('shortDurationLoad', 0)
-    longDurationLoad = input_data.get('longDurationLoad', 0)
-    allowable_Deflection = input_data.get('allowable_Deflection', 0)
-    glass_length = input_data.get('glassLength', 0)
-    glass_width = input_data.get('glassWidth', 0)
-    number_of_supported_sides = input_data.get('numberOfSupportedSides', 0)
-    glazing_type = input_data.get('glazingType', 0)
-    number_of_layers = input_data.get('numberOfLayers', 0)
-    layers_types = input_data.get('layersTypes', [])
-    layers_thicknesses = input_data.get('layersThicknesses', [])
     plyThicknessList = data.get('plyThicknessList', [])
-    glass_layers_strength_type = input_data.get('glassLayersStrengthType', [])
-    number_of_plies = input_data.get('numberOfPlies', 0)
-    pvb_thicknesses = input_data.get('pvbThicknesses', [])  # Retrieve the PVB thicknesses sent from JS
-    interlayerTypes = input_data.get('interlayerTypes', [])
-    airGap = input_data.get('airGap', 0)
-    first_page_image_path = "download/first_page.jpg"
-
-    nfl_result = []
-    gtf = get_gtf_value(glass_layers_strength_type, glazing_type)
-    short_cof_to_send = []
-    long_cof_to_send = []
-    lr = []
-    lr_value = 0
-    recommended_thickness = {'Short': [], 'Long': []}
-    # Generate plot and save as image
-    temp__dir = os.path.join(os.getcwd(), "download")
-    os.makedirs(temp__dir, exist_ok=True)
-    logo_path = os.path.join(temp__dir, "logo.png")
-    first_page_image_path = os.path.join(temp__dir, "first_page.jpg")
-
-    # Perform NFL calculation for each layer's thickness
-    if number_of_supported_sides == 4:
-        for thickness in layers_thicknesses:
-            try:
-                result = calculate_nfl(glass_length, glass_width, number_of_supported_sides, thickness, layers_types)
-
-            except:
-                return jsonify("Adjust your input data"), 400
-
-            if isinstance(result, tuple):
-                NFL_interpolated, jsonX, jsonY, jsonNFL, length, width, xi, yi, zi, AR, key = result
-                nfl_result.append(round(float(NFL_interpolated), 2))  # Convert to float
-            else:
-                return result
-            try:
-                cof_short_duration = round(
-                    float(calculate_cof(shortDurationLoad, glass_length, glass_width, modulus_of_elasticity, thickness,
-                                        interlayerTypes)), 2)
-
-                short_cof_to_send.append(cof_short_duration)
-
-                if longDurationLoad != 0:
-                    cof_long_duration = round(
-                        float(calculate_cof(longDurationLoad, glass_length, glass_width, modulus_of_elasticity,
-                                            thickness, interlayerTypes)), 2)
-                    long_cof_to_send.append(cof_long_duration)
-            except ValueError:
-                if number_of_supported_sides == 4:
-                    return jsonify("Adjust the width or the length of the glass"), 400
-                else:
-                    return jsonify("Adjust the length of the unsupported side"), 400
-
-            except TypeError:
-                if number_of_supported_sides == 4:
-                    return jsonify("Adjust the widt or the length of the glass"), 400
-                else:
-                    return jsonify("Adjust the length of the unsupported side"), 400
 
+    # Repeated submissions are answered from the cache without recalculating
+    cache_key = result_cache.canonical_key(input_data, plyThicknessList)
+    with timing.span('cache'):
+        entry = result_cache.results.get(cache_key)
+    if entry is None:
         try:
-            # calculated_nfl = nfl_result[0] if isinstance(nfl_result, list) and nfl_result else nfl_result
-            calculated_nfl = nfl_result
-
-            plot_interpolated_nfl = []
-            for index, (layers_thickness, layer_type) in enumerate(zip(layers_thicknesses, layers_types)):
-                interpolated_nfl, plot_paths = plot_nfl_from_json(
-                    glass_length, glass_width, number_of_supported_sides,
-                    layers_thickness, os.path.join(temp__dir, f"nfl_plot_{layers_thickness}"),
-                    calculated_nfl, layer_type, index  # Pass the index along with other parameters
-                )
-                plot_interpolated_nfl.append(interpolated_nfl)
-
-        except Exception as e:
-            return jsonify("Adjust your input data"), 400
-
-    else:
-        try:
-            for thickness, layer_type in zip(layers_thicknesses, layers_types):
-                nfl_result.append(find_load_for_given_length(thickness, glass_length, layer_type,
-                                                             number_of_supported_sides, "NFL", 0,
-                                                             interlayerTypes))
-
-                cof_short_duration = find_load_for_given_length(thickness, glass_length, layer_type,
-                                                                number_of_supported_sides, "COF", shortDurationLoad,
-                                                                interlayerTypes)
-                short_cof_to_send.append(cof_short_duration)
-
-                if longDurationLoad != 0:
-                    cof_long_duration = find_load_for_given_length(thickness, glass_length, layer_type,
-                                                                   number_of_supported_sides, "COF", longDurationLoad,
-                                                                   interlayerTypes)
-                    long_cof_to_send.append(cof_long_duration)
-        except:
-            return jsonify("Adjust your input data"), 400
-
-    # Load share factor (LSF) and LR calculations
-    if glazing_type == "double":
-        try:
-            lsf_value = get_load_share_factor(layers_thicknesses, layers_types)
-        except:
-            return jsonify("Adjust your input data"), 400
+            with timing.span('calculate'):
+                results = calculate_panel(input_data)
+        except CalculationError as e:
+            return jsonify(e.payload), e.status
+
+        results.pop('plots')
+        entry = {'results': results, 'job_id': None, 'pdf': None}
+        result_cache.results.put(cache_key, entry)
+
+    # The plots and the PDF are rendered in the background, the client polls /report/<job_id>
+    with timing.span('report_submit'):
+        job = get_report_job(entry, input_data, plyThicknessList)
+    report_url = url_for('report', job_id=job.job_id, _external=True)
+
+    return jsonify({'pdf_url': report_url, 'report_url': report_url, 'job_id': job.job_id,
+                    'results': entry['results']})
+
+
+def get_report_job(entry, input_data, plyThicknessList):
+    """
+    Return the report job of a cached calculation, starting one only when no usable report exists.
+    """
+    # Identical concurrent requests share the entry, only one of them may start its job
+    with result_cache.results.entry_lock:
+        job = report_jobs.get(entry['job_id']) if entry['job_id'] else None
+        if job is not None:
+            status = job.status
+            if status in ('pending', 'running') or (status == 'done' and
+                                                    artifacts.get(job.result(), REPORT_FILENAME) is not None):
+                return job
+
+        if entry['pdf'] is not None:
+            job = report_jobs.submit(store_report, entry['pdf'])
+        else:
+            job = report_jobs.submit(profiler.profiled(render_report_artifacts, 'report'), input_data,
+                                     plyThicknessList, entry['results'], entry)
+        entry['job_id'] = job.job_id
+        return job
 
-        try:
-            if number_of_supported_sides == 4:
-                lr_value = calculate_lr(plot_interpolated_nfl, gtf, lsf_value, glazing_type)
-            else:
-                lr_value = calculate_lr(nfl_result, gtf, lsf_value, glazing_type)
-            lr.append(lr_value)
-        except:
-            return jsonify("Adjust your input data"), 400
-
-    else:
-        lsf_value = None  # or a more meaningful default value, if None isn't appropriate
-        if number_of_supported_sides == 4:
-            try:
-                for nfl_interpolated_value in plot_interpolated_nfl:
-                    lr_value = calculate_lr(nfl_interpolated_value, gtf, lsf_value, "single")
-            except:
-                return jsonify("Adjust your input data"), 400
 
-        else:
-            try:
-                for nfl_value in nfl_result:
-                    lr_value = calculate_lr(nfl_value, gtf, lsf_value, "single")
-            except:
-                return jsonify("Adjust your input data"), 400
-        lr.append(lr_value)
+def render_report_artifacts(input_data, plyThicknessList, results, cache_entry=None):
+    """
+    Draw the plots and the PDF report of a calculated panel into the artifact store.
+
+    Args:
+        cache_entry (dict, optional): Result cache entry that keeps the PDF bytes for repeated requests.
+
+    Returns:
+        str: The artifact id the plots and the PDF are stored under.
+    """
+    artifact_id = artifacts.new_artifact_id()
+    for filename, plot in render_plots(input_data, results):
+        artifacts.put(artifact_id, filename, plot)
+
+    pdf = render_report_bytes(input_data, plyThicknessList, results)
+    if cache_entry is not None:
+        cache_entry['pdf'] = pdf
+    artifacts.put(artifact_id, REPORT_FILENAME, pdf)
+
+    return artifact_id
+
+
+def render_report_bytes(input_data, plyThicknessList, results):
+    from pdf_creation import load_image
+
+    temp__dir = os.path.join(os.getcwd(), "download")
+    logo = load_image(os.path.join(temp__dir, "logo.png"))
+    first_page_image = load_image(os.path.join(temp__dir, "first_page.jpg"))
 
     # Generate PDF in memory
     pdf_bytes = io.BytesIO()
+    render_report(pdf_bytes, input_data, plyThicknessList, results, logo, first_page_image)
+    return pdf_bytes.getvalue()
+
+
+def store_report(pdf):
+    """
+    Store an already rendered PDF under a new artifact id.
+
+    Returns:
+        str: The artifact id.
+    """
+    artifact_id = artifacts.new_artifact_id()
+    artifacts.put(artifact_id, REPORT_FILENAME, pdf)
+    return artifact_id
+
+
+@app.route('/report/<job_id>')
+def report(job_id):
+    """
+    Report status and download: 202 while the report is rendered, the PDF once it is done.
+    """
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown report"}), 404
+
+    status = job.status
+    if status == 'done':
+        pdf = artifacts.get(job.result(), REPORT_FILENAME)
+        if pdf is None:
+            return jsonify({"status": "expired", "error": "The report has expired"}), 410
+        return send_file(io.BytesIO(pdf), mimetype='application/pdf', download_name=REPORT_FILENAME)
+    if status == 'failed':
+        app.logger.error("Report %s failed", job_id, exc_info=job.future.exception())
+        return jsonify({"status": status, "error": "The report could not be generated"}), 500
+    return jsonify({"status": status}), 202
+
+
+def calculate_batch_panel(index, input_data, include_plots, include_report):
+    """
+    Calculate one panel of a /calculate_batch request and build its NDJSON record.
+    """
+    if not isinstance(input_data, dict):
+        return {'index': index, 'status': 400, 'error': "Invalid data format"}
 
-    # Calculate glass weight including PVB layers
-    try:
-        glass_weight = calculate_glass_weight(
-            glass_length, glass_width, layers_thicknesses, layers_types, pvb_thicknesses=pvb_thicknesses
-        )
-    except:
-        return jsonify("Adjust your input data"), 400
+    plyThicknessList = input_data.get('plyThicknessList', [])
+    panel_data = {key: value for key, value in input_data.items() if key != 'plyThicknessList'}
 
-    print("short_cof_to_send", short_cof_to_send)
-    print("long_cof_to_send", long_cof_to_send)
+    # Plots are drawn while calculating, so only plot-less panels can be answered from the cache
+    cache_key = result_cache.canonical_key(panel_data, plyThicknessList)
+    entry = None if include_plots else result_cache.results.get(cache_key)
+    plots = []
+    if entry is None:
+        try:
+            results = calculate_panel(panel_data, include_plots=include_plots)
+        except CalculationError as e:
+            return {'index': index, 'status': e.status, 'error': e.payload}
+        except Exception:
+            # One broken panel must not end the stream for the others
+            app.logger.exception("Batch panel %s failed", index)
+            return {'index': index, 'status': 500, 'error': "Adjust your input data"}
+
+        plots = results.pop('plots')
+        # A panel with plots skipped the lookup, so an already cached entry is kept with its report job and PDF
+        entry = result_cache.results.put_if_absent(cache_key, {'results': results, 'job_id': None, 'pdf': None})
+
+    record = {'index': index, 'status': 200, 'results': entry['results']}
+    artifact_id = artifacts.new_artifact_id() if plots or include_report else None
+
+    if include_plots:
+        record['plot_urls'] = []
+        for filename, plot in plots:
+            artifacts.put(artifact_id, filename, plot)
+            record['plot_urls'].append(url_for('download_artifact', artifact_id=artifact_id, filename=filename,
+                                               _external=True))
+
+    if include_report:
+        if entry['pdf'] is None:
+            entry['pdf'] = render_report_bytes(panel_data, plyThicknessList, entry['results'])
+        artifacts.put(artifact_id, REPORT_FILENAME, entry['pdf'])
+        record['pdf_url'] = url_for('download_artifact', artifact_id=artifact_id, filename=REPORT_FILENAME,
+                                    _external=True)
+
+    return record
+
+
+@app.route("/calculate_batch", methods=['POST'])
+def calculate_batch():
+    """
+    Calculate a list of panels and stream one JSON line per panel as soon as it is done.
+
+    Body: {"panels": [data, ...], "includePlots": false, "includeReport": false}, where every panel has the
+    shape of the 'data' field of /calculate (plus an optional 'plyThicknessList' for its report).
+    """
+    data = request.get_json()
 
-    if short_cof_to_send[0] > float(allowable_Deflection) or (len(long_cof_to_send) > 0 and long_cof_to_send[0] >
-                                                              float(allowable_Deflection)):
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
 
-        recommended_thickness = find_correct_thickness(shortDurationLoad, longDurationLoad, allowable_Deflection,
-                                                       number_of_supported_sides, glass_length, glass_width,
-                                                       modulus_of_elasticity, interlayerTypes,
-                                                       layer_type)
-        print("recommended_thickness", recommended_thickness)
+    panels = data.get('panels')
+    if not isinstance(panels, list):
+        return jsonify({"error": "Invalid data format"}), 400
 
-    create_pdf(pdf_bytes, glass_length, glass_width, pvb_thicknesses, number_of_supported_sides, layers_thicknesses,
-               plyThicknessList, glass_weight, shortDurationLoad, longDurationLoad, allowable_Deflection, lr,
-               glazing_type, short_cof_to_send, long_cof_to_send, layers_types, interlayerTypes, recommended_thickness,
-               airGap, glass_layers_strength_type, logo_path, first_page_image_path)
-    pdf_bytes.seek(0)
+    include_plots = bool(data.get('includePlots', False))
+    include_report = bool(data.get('includeReport', False))
 
-    # Save PDF to a temporary location
-    temp_pdf_path = os.path.join(temp__dir, "deflection_result.pdf")
-    with open(temp_pdf_path, 'wb') as f:
-        f.write(pdf_bytes.getbuffer())
+    def generate():
+        for index, input_data in enumerate(panels):
+            record = calculate_batch_panel(index, input_data, include_plots, include_report)
+            yield json.dumps(record) + '\n'
 
-    # Return the JSON response with a URL to download the PDF
-    pdf_url = url_for('download_pdf', filename='deflection_result.pdf', _external=True)
+    return Response(stream_with_context(timed_stream(generate())), mimetype='application/x-ndjson')
 
-    return jsonify({'pdf_url': pdf_url})
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(result_cache.results.stats())
 
 
 @app.route('/download/<filename>')
 def download_pdf(filename):
-    return send_file(os.path.join('download', filename))
+    return send_from_directory('download', filename)
+
+
+@app.route('/download/<artifact_id>/<filename>')
+def download_artifact(artifact_id, filename):
+    data = artifacts.get(artifact_id, filename)
+    if data is None:
+        return jsonify({"error": "File not found"}), 404
+    return send_file(io.BytesIO(data), mimetype=artifacts.guess_mimetype(filename), download_name=filename)
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
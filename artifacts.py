@@ -0,0 +1,107 @@
+import os
+import re
+import time
+import uuid
+import mimetypes
+import threading
+from collections import OrderedDict
+
+# Total size of the plots and reports kept in memory per process, least recently used are evicted first
+ARTIFACT_STORE_BYTES = int(os.environ.get('ARTIFACT_STORE_BYTES', 128 * 1024 * 1024))
+# Seconds an artifact is kept before it expires
+ARTIFACT_TTL = int(os.environ.get('ARTIFACT_TTL', 3600))
+
+_ARTIFACT_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ArtifactStore:
+    """
+    In-memory store for the generated plots and reports, bounded by total size and age.
+
+    Files are grouped under an artifact id (one per request) and addressed by (artifact_id, filename).
+    The store is private to its process, so gunicorn.conf.py runs a single worker.
+    """
+
+    def __init__(self, max_bytes=ARTIFACT_STORE_BYTES, ttl=ARTIFACT_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, artifact_id, filename, data):
+        """
+        Store the bytes of a file, evicting the least recently used files beyond the size limit.
+        """
+        key = (artifact_id, filename)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self._items[key] = (time.monotonic(), data)
+            self.size += len(data)
+            self._purge_locked()
+
+    def get(self, artifact_id, filename):
+        """
+        Return the bytes of a file, or None if it is unknown, expired or evicted.
+        """
+        key = (artifact_id, filename)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if self.ttl and time.monotonic() - item[0] > self.ttl:
+                self._remove_locked(key)
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def purge_expired(self):
+        with self._lock:
+            return self._purge_locked()
+
+    def _remove_locked(self, key):
+        _, data = self._items.pop(key)
+        self.size -= len(data)
+
+    def _purge_locked(self):
+        removed = 0
+        if self.ttl:
+            deadline = time.monotonic() - self.ttl
+            expired = [key for key, (created, _) in self._items.items() if created < deadline]
+            for key in expired:
+                self._remove_locked(key)
+            removed += len(expired)
+
+        while self.size > self.max_bytes and self._items:
+            self._remove_locked(next(iter(self._items)))
+            self.evictions += 1
+            removed += 1
+        return removed
+
+
+store = ArtifactStore()
+
+
+def new_artifact_id():
+    return uuid.uuid4().hex
+
+
+def is_artifact_id(artifact_id):
+    return bool(_ARTIFACT_ID.match(artifact_id))
+
+
+def put(artifact_id, filename, data):
+    store.put(artifact_id, filename, data)
+
+
+def get(artifact_id, filename):
+    if not is_artifact_id(artifact_id):
+        return None
+    return store.get(artifact_id, filename)
+
+
+def guess_mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
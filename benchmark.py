@@ -0,0 +1,249 @@
+"""
+Benchmarks of every calculation stage, from the single chart lookups to the /calculate endpoint.
+
+    python benchmark.py                            # run all, print a table
+    python benchmark.py --output results.json      # also store the results as JSON
+    python benchmark.py --compare baseline.json    # fail (exit 1) on regressions against a stored run
+    python benchmark.py --filter cof               # only the benchmarks whose name contains 'cof'
+
+Every benchmark uses fixed, representative inputs. It is run once untimed (so caches and lazy
+imports are warm), then timed with timeit in several rounds; the median time per call is compared.
+"""
+import io
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+
+MODULUS_OF_ELASTICITY = 71700000
+
+# A double glazed 4-sided panel, as sent by the web form
+PANEL = {
+    'shortDurationLoad': 1.5,
+    'longDurationLoad': 0.5,
+    'allowable_Deflection': 20,
+    'glassLength': 2000,
+    'glassWidth': 1200,
+    'numberOfSupportedSides': 4,
+    'glazingType': 'double',
+    'layersTypes': ['mono', 'mono'],
+    'layersThicknesses': [6, 8],
+    'glassLayersStrengthType': ['tempered', 'annealed'],
+    'pvbThicknesses': [],
+    'interlayerTypes': ['PVB'],
+    'airGap': 12,
+}
+
+
+def bench_calculate_nfl():
+    from nfl_calculation import calculate_nfl
+    return lambda: calculate_nfl(2000, 1200, 4, 6, ['mono'])
+
+
+def bench_calculate_nfl_1_sided():
+    from NFL_COF_1and2Sided import find_load_for_given_length
+    return lambda: find_load_for_given_length(10, 1000, 'mono', 1, "NFL", 0, ['PVB'])
+
+
+def bench_calculate_cof_2_sided():
+    from NFL_COF_1and2Sided import find_load_for_given_length
+    return lambda: find_load_for_given_length(10, 1000, 'laminated', 2, "COF", 1.5, ['PVB'])
+
+
+def bench_evaluate_1_2_sided_cof():
+    import numpy as np
+    from NFL_COF_1and2Sided import evaluate_1_2_sided
+    lengths = np.linspace(500, 3000, 1000)
+    return lambda: evaluate_1_2_sided(10, lengths, 'laminated', 2, "COF", 1.5, ['PVB'])
+
+
+def bench_calculate_cof():
+    from cof_calculation import calculate_cof
+    return lambda: calculate_cof(1.5, 2000, 1200, MODULUS_OF_ELASTICITY, 6, ['PVB'])
+
+
+def bench_get_gtf_value():
+    from get_gtf import get_gtf_value
+    return lambda: get_gtf_value(['tempered', 'annealed'], 'double')
+
+
+def bench_get_load_share_factor():
+    from get_load_share_factor import get_load_share_factor
+    return lambda: get_load_share_factor([6, 8], ['mono', 'mono'])
+
+
+def bench_calculate_lr():
+    from lr_calculation import calculate_lr
+    from get_gtf import get_gtf_value
+    from get_load_share_factor import get_load_share_factor
+    gtf = get_gtf_value(['tempered', 'annealed'], 'double')
+    lsf = get_load_share_factor([6, 8], ['mono', 'mono'])
+    return lambda: calculate_lr([1.83, 2.92], gtf, lsf, 'double')
+
+
+def bench_calculate_glass_weight():
+    from glass_weight import calculate_glass_weight
+    return lambda: calculate_glass_weight(2000, 1200, [6, 8], ['mono', 'laminated'], pvb_thicknesses=[1.52])
+
+
+def bench_plot_nfl_from_json():
+    from newPlotting import plot_nfl_from_json
+    return lambda: plot_nfl_from_json(2000, 1200, 4, 6, "benchmark", [1.83], 'mono', 0)
+
+
+def bench_create_pdf():
+    from panel_calculation import calculate_panel, render_report
+    from pdf_creation import load_image
+    results = calculate_panel(PANEL)
+    logo = load_image(os.path.join('download', 'logo.png'))
+    first_page_image = load_image(os.path.join('download', 'first_page.jpg'))
+    return lambda: render_report(io.BytesIO(), PANEL, [], results, logo, first_page_image)
+
+
+def bench_calculate_panel():
+    from panel_calculation import calculate_panel
+    return lambda: calculate_panel(PANEL)
+
+
+def _post_calculate(client, body):
+    response = client.post('/calculate', json=body)
+    if response.status_code != 200:
+        raise RuntimeError(f"/calculate returned {response.status_code}: {response.get_data(as_text=True)}")
+    return response.get_json()
+
+
+def bench_app_calculate():
+    import app
+    import report_jobs
+    import result_cache
+    client = app.create_app(warm=False).test_client()
+    body = {'data': PANEL, 'plyThicknessList': []}
+
+    def run():
+        # Uncached request, including the background report so jobs do not pile up between calls
+        result_cache.results.clear()
+        report_jobs.get(_post_calculate(client, body)['job_id']).result()
+
+    return run
+
+
+def bench_app_calculate_cached():
+    import app
+    client = app.create_app(warm=False).test_client()
+    body = {'data': PANEL, 'plyThicknessList': []}
+    return lambda: _post_calculate(client, body)
+
+
+BENCHMARKS = {
+    'calculate_nfl': bench_calculate_nfl,
+    'find_load_for_given_length_nfl': bench_calculate_nfl_1_sided,
+    'find_load_for_given_length_cof': bench_calculate_cof_2_sided,
+    'evaluate_1_2_sided_cof': bench_evaluate_1_2_sided_cof,
+    'calculate_cof': bench_calculate_cof,
+    'get_gtf_value': bench_get_gtf_value,
+    'get_load_share_factor': bench_get_load_share_factor,
+    'calculate_lr': bench_calculate_lr,
+    'calculate_glass_weight': bench_calculate_glass_weight,
+    'plot_nfl_from_json': bench_plot_nfl_from_json,
+    'create_pdf': bench_create_pdf,
+    'calculate_panel': bench_calculate_panel,
+    'app_calculate': bench_app_calculate,
+    'app_calculate_cached': bench_app_calculate_cached,
+}
+
+
+def run_benchmark(setup, repeat=5, min_time=0.2):
+    """
+    Time one benchmark.
+
+    Args:
+        setup (callable): Returns the function to time.
+        repeat (int): Number of timed rounds.
+        min_time (float): Minimum duration of a round in seconds.
+
+    Returns:
+        dict: Seconds per call (min and median over the rounds), calls per round and rounds.
+    """
+    function = setup()
+    function()
+
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    times = sorted(t / number for t in timer.repeat(repeat=repeat, number=number))
+    return {
+        'min': times[0],
+        'median': times[len(times) // 2],
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare median times against a stored run.
+
+    Returns:
+        list: (name, baseline median, current median) of every benchmark slower than the threshold allows.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if before is not None and result['median'] > before['median'] * (1 + threshold):
+            regressions.append((name, before['median'], result['median']))
+    return regressions
+
+
+def _format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the calculation stages.")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="JSON file of a previous run to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown against --compare, as a fraction (default 0.25)")
+    parser.add_argument('--filter', default='', help="only run benchmarks whose name contains this text")
+    parser.add_argument('--repeat', type=int, default=5, help="timed rounds per benchmark (default 5)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        results[name] = run_benchmark(setup, repeat=args.repeat)
+        print(f"{name:<32} {_format_time(results[name]['median']):>10} median  "
+              f"{_format_time(results[name]['min']):>10} min")
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {_format_time(before)} -> {_format_time(after)}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import os
+import sys
+import json
+import struct
+
+import numpy as np
+
+# Chart bundle layout:
+#   MAGIC, version (uint32), header length (uint32, padded to 8 bytes), header (UTF-8 JSON index),
+#   then the data section of little-endian float64 arrays, each starting on an 8 byte boundary.
+# The header maps every source file (relative to the Json directory) to its recorded mtime and size
+# and to the location of its data. NFL contour charts are stored as arrays, every other file as its
+# raw JSON text.
+MAGIC = b'GWLCHART'
+VERSION = 1
+BUNDLE_NAME = 'charts.bundle'
+
+_PREAMBLE = struct.Struct('<8sII')
+_FLOAT = np.dtype('<f8')
+
+
+def default_bundle_path(base_dir):
+    return os.path.join(base_dir, BUNDLE_NAME)
+
+
+def _is_nfl_chart(relative_path):
+    # 3- and 4-sided NFL files are contour charts of {"NFL", "X", "Y"} records
+    parts = relative_path.split(os.sep)
+    return len(parts) == 4 and parts[0] == 'NFL' and parts[2] in ('3Sided', '4Sided')
+
+
+def _align(offset):
+    return (offset + 7) // 8 * 8
+
+
+def compile_bundle(base_dir, bundle_path=None):
+    """
+    Compile every JSON file under base_dir into a single chart bundle.
+
+    Args:
+        base_dir (str): The chart directory, e.g. './Json'.
+        bundle_path (str, optional): Where to write the bundle, inside base_dir by default.
+
+    Returns:
+        int: The number of files in the bundle.
+    """
+    bundle_path = bundle_path or default_bundle_path(base_dir)
+    files = {}
+    blocks = []
+    offset = 0
+
+    for root, dirs, names in os.walk(base_dir):
+        dirs.sort()
+        for name in sorted(names):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(root, name)
+            relative_path = os.path.relpath(path, base_dir)
+            stat = os.stat(path)
+            with open(path, 'rb') as file:
+                raw = file.read()
+
+            record = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'offset': offset}
+            key = os.path.splitext(name)[0]
+            document = json.loads(raw) if _is_nfl_chart(relative_path) else None
+            if document is not None and key in document:
+                data_list = document[key]
+                values = np.array([(item['X'], item['Y'], item['NFL']) for item in data_list],
+                                  dtype=_FLOAT).reshape(-1, 3)
+
+                # Contour levels keep their JSON value (int or float) so labels read like the source chart
+                levels = list(dict.fromkeys(item['NFL'] for item in data_list))
+                contours = [values[values[:, 2] == level, :2] for level in levels]
+
+                data = np.concatenate([values[:, :2].ravel(), values[:, 2]] +
+                                      [points.ravel() for points in contours]).astype(_FLOAT).tobytes()
+                record.update(kind='nfl', key=key, count=len(values), levels=levels,
+                              contour_counts=[len(points) for points in contours])
+            else:
+                data = raw
+                record.update(kind='json', length=len(raw))
+
+            files[relative_path.replace(os.sep, '/')] = record
+            blocks.append(data + b'\0' * (_align(len(data)) - len(data)))
+            offset += len(blocks[-1])
+
+    header = json.dumps({'version': VERSION, 'files': files}, separators=(',', ':')).encode('utf-8')
+    header += b' ' * (_align(_PREAMBLE.size + len(header)) - _PREAMBLE.size - len(header))
+
+    # Written next to the target and renamed, so running workers never see a partial bundle
+    temp_path = bundle_path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        file.write(header)
+        for block in blocks:
+            file.write(block)
+    os.replace(temp_path, bundle_path)
+    return len(files)
+
+
+class ChartBundle:
+    """
+    Read-only, memory-mapped view of a chart bundle.
+
+    The arrays handed out are views of the mapping, so the pages are shared by every process
+    that opens the same bundle.
+    """
+
+    def __init__(self, bundle_path, base_dir):
+        self.base_dir = os.path.abspath(base_dir)
+        self._data = np.memmap(bundle_path, dtype=np.uint8, mode='r')
+        magic, version, header_length = _PREAMBLE.unpack(self._data[:_PREAMBLE.size].tobytes())
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Unsupported chart bundle: {bundle_path}")
+
+        header = json.loads(self._data[_PREAMBLE.size:_PREAMBLE.size + header_length].tobytes())
+        self._data_start = _PREAMBLE.size + header_length
+        self.files = {os.path.join(self.base_dir, *name.split('/')): record
+                      for name, record in header['files'].items()}
+
+    def lookup(self, full_path, stat):
+        """
+        Return the record of a source file if the bundle holds its current contents, else None.
+        """
+        record = self.files.get(full_path)
+        if record is None or record['mtime_ns'] != stat.st_mtime_ns or record['size'] != stat.st_size:
+            return None
+        return record
+
+    def _floats(self, offset, count):
+        return np.frombuffer(self._data, dtype=_FLOAT, count=count, offset=self._data_start + offset)
+
+    def nfl_arrays(self, record):
+        """
+        Return the arrays of an NFL chart record.
+
+        Returns:
+            tuple: (N, 2) points, (N,) NFL values and a dict of NFL level -> (M, 2) contour points.
+        """
+        count = record['count']
+        offset = record['offset']
+        points = self._floats(offset, 2 * count).reshape(count, 2)
+        nfl = self._floats(offset + 16 * count, count)
+
+        contours = {}
+        offset += 24 * count
+        for level, contour_count in zip(record['levels'], record['contour_counts']):
+            contours[level] = self._floats(offset, 2 * contour_count).reshape(contour_count, 2)
+            offset += 16 * contour_count
+        return points, nfl, contours
+
+    def document(self, record, full_path):
+        """
+        Return the parsed JSON of a record; NFL charts are read back from their source file.
+        """
+        if record['kind'] == 'nfl':
+            with open(full_path, 'r') as file:
+                return json.load(file)
+        start = self._data_start + record['offset']
+        return json.loads(self._data[start:start + record['length']].tobytes())
+
+
+def load_bundle(base_dir, bundle_path=None):
+    """
+    Open the chart bundle of base_dir.
+
+    Returns:
+        ChartBundle or None: The bundle, or None if it was not compiled or cannot be read.
+    """
+    bundle_path = bundle_path or default_bundle_path(base_dir)
+    if not os.path.exists(bundle_path):
+        return None
+    try:
+        return ChartBundle(bundle_path, base_dir)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring chart bundle {bundle_path}: {e}")
+        return None
+
+
+if __name__ == '__main__':
+    # python chart_bundle.py [Json directory]
+    chart_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join('.', 'Json')
+    print(f"{compile_bundle(chart_dir)} files compiled into {default_bundle_path(chart_dir)}")
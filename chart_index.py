@@ -0,0 +1,233 @@
+import numpy as np
+import chart_registry
+
+EPSILON = 1e-10
+
+
+class ChartIndex:
+    """
+    Spatial index of one NFL chart, built once per chart file.
+
+    Holds a KD-tree over all chart points and one per NFL contour, so the nearest-point, enclosing
+    contour and inverse distance weighting queries need no per-request lists, dicts or trees.
+
+    Attributes:
+        chart (NFLChart): The indexed chart.
+        levels (np.ndarray): The sorted NFL contour levels.
+    """
+
+    def __init__(self, chart):
+        # Imported on first use to keep scipy out of the import time of the app
+        from scipy.spatial import cKDTree
+
+        self.chart = chart
+        self.tree = cKDTree(chart.points)
+        self._level_keys = chart.levels
+        self.levels = np.array(self._level_keys, dtype=float)
+        self._contour_trees = {level: cKDTree(points) for level, points in chart.contours.items()}
+
+    def closest_points(self, length, width, n_points=4):
+        """
+        Find the chart points closest to a panel size, the long side being used as length.
+
+        Returns:
+            tuple: The (k, 2) coordinates and (k,) NFL values of the closest points, nearest first.
+        """
+        if width > length:
+            width, length = length, width
+        indices = self._query(self.tree, length, width, n_points)
+        return self.chart.points[indices], self.chart.nfl[indices]
+
+    def enclosing_levels(self, calculated_nfl):
+        """
+        Find the NFL contours enclosing an NFL value, like newPlotting.find_enclosing_nfl_lines.
+
+        Returns:
+            tuple: The highest level <= calculated_nfl and the lowest level > calculated_nfl, None when missing.
+        """
+        position = int(np.searchsorted(self.levels, calculated_nfl, side='right'))
+        lower_nfl = self._level_keys[position - 1] if position > 0 else None
+        upper_nfl = self._level_keys[position] if position < len(self._level_keys) else None
+        return lower_nfl, upper_nfl
+
+    def closest_contour_points(self, level, length, width, n_points):
+        """
+        Find the points of one contour closest to (length, width), nearest first.
+
+        Raises:
+            KeyError: If the chart has no contour at that level.
+        """
+        points = self.chart.contours[level]
+        return points[self._query(self._contour_trees[level], length, width, n_points)]
+
+    def weighted_nfl(self, length, width, lower_nfl, upper_nfl, n_points=4):
+        """
+        Inverse distance weighted NFL of the points closest to (length, width) on the two enclosing contours.
+
+        Gives the same value as newPlotting.find_and_weight_closest_points_from_nfl_lines.
+
+        Raises:
+            ValueError: If one of the levels is missing, i.e. the NFL value lies outside the chart.
+        """
+        if lower_nfl is None or upper_nfl is None:
+            raise ValueError("The NFL value is not enclosed by two NFL lines of the chart")
+
+        n_points_per_line = max(1, n_points // 2)
+        lower_coords = self.closest_contour_points(lower_nfl, length, width, n_points_per_line)
+        upper_coords = self.closest_contour_points(upper_nfl, length, width, n_points_per_line)
+
+        coords = np.vstack([lower_coords, upper_coords])
+        values = np.concatenate([np.full(len(lower_coords), lower_nfl, dtype=float),
+                                 np.full(len(upper_coords), upper_nfl, dtype=float)])
+        return inverse_distance_weighting(length, width, coords, values)
+
+    def estimate_nfl(self, length, width, calculated_nfl, n_points=4):
+        """
+        Estimate the NFL from the two contours enclosing the calculated NFL value.
+        """
+        if width > length:
+            width, length = length, width
+        lower_nfl, upper_nfl = self.enclosing_levels(calculated_nfl)
+        return self.weighted_nfl(length, width, lower_nfl, upper_nfl, n_points)
+
+    def estimate_nfl_batch(self, lengths, widths, calculated_nfls, n_points=4):
+        """
+        Vectorized estimate_nfl for many panels of the same chart.
+
+        Args:
+            lengths (array-like): Glass lengths in mm.
+            widths (array-like): Glass widths in mm, broadcastable against lengths.
+            calculated_nfls (array-like): The calculated NFL of every panel, broadcastable against lengths.
+            n_points (int): Number of closest points used, half from each enclosing contour.
+
+        Returns:
+            np.ndarray: The estimated NFL of every panel (not rounded), NaN where the NFL value is not
+                        enclosed by two contours.
+        """
+        lengths, widths, calculated_nfls = np.broadcast_arrays(np.asarray(lengths, dtype=float),
+                                                               np.asarray(widths, dtype=float),
+                                                               np.asarray(calculated_nfls, dtype=float))
+        shape = lengths.shape
+        targets = np.column_stack((np.maximum(lengths, widths).ravel(), np.minimum(lengths, widths).ravel()))
+        calculated_nfls = calculated_nfls.ravel()
+
+        positions = np.searchsorted(self.levels, calculated_nfls, side='right')
+        enclosed = (positions > 0) & (positions < len(self.levels))
+
+        n_points_per_line = max(1, n_points // 2)
+        count = len(targets)
+        # Lower contour points first, then upper; contours shorter than n_points_per_line leave unused slots
+        coords = np.zeros((count, 2 * n_points_per_line, 2))
+        values = np.zeros((count, 2 * n_points_per_line))
+        used = np.zeros((count, 2 * n_points_per_line), dtype=bool)
+
+        for offset, level_positions in ((0, positions - 1), (n_points_per_line, positions)):
+            for position in np.unique(level_positions[enclosed]):
+                rows = np.flatnonzero(enclosed & (level_positions == position))
+                level = self._level_keys[position]
+                tree = self._contour_trees[level]
+                k = min(n_points_per_line, tree.n)
+                _, indices = tree.query(targets[rows], k=k)
+                indices = indices.reshape(len(rows), k)
+
+                slots = slice(offset, offset + k)
+                coords[rows, slots] = self.chart.contours[level][indices]
+                values[rows, slots] = self.levels[position]
+                used[rows, slots] = True
+
+        # Panels outside the chart have no points at all, their 0 / 0 becomes NaN
+        with np.errstate(invalid='ignore'):
+            nfl = inverse_distance_weighting(targets[:, 0], targets[:, 1], coords, values, used)
+        nfl[~enclosed] = np.nan
+        return nfl.reshape(shape)
+
+    def intersection_points(self, length, width, lower_nfl, upper_nfl):
+        """
+        Find where the aspect ratio line of a panel crosses the two enclosing contours.
+
+        Returns:
+            list: (x, y, nfl) for each of the two contours the line crosses.
+        """
+        intersection_points = []
+        for nfl in (lower_nfl, upper_nfl):
+            points = aspect_ratio_intersections(length, width, self.chart.contours[nfl])
+            if not np.isnan(points[0]):
+                intersection_points.append((points[0], points[1], nfl))
+        return intersection_points
+
+    @staticmethod
+    def _query(tree, x, y, n_points):
+        _, indices = tree.query([x, y], k=min(n_points, tree.n))
+        return np.atleast_1d(indices)
+
+
+def inverse_distance_weighting(x, y, coords, values, mask=None):
+    """
+    Inverse distance weighting of point values at target positions.
+
+    Args:
+        x, y (float or array-like): The target position, or (B,) arrays of target positions.
+        coords (np.ndarray): (k, 2) point coordinates, or (B, k, 2) for one set of points per target.
+        values (np.ndarray): (k,) or (B, k) values of the points.
+        mask (np.ndarray, optional): (k,) or (B, k) booleans, False for points to leave out.
+
+    Returns:
+        float or np.ndarray: The weighted value at each target, a float for a scalar target.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    distances = np.sqrt((coords[..., 0] - x[..., None]) ** 2 + (coords[..., 1] - y[..., None]) ** 2) + EPSILON
+    weights = 1 / distances
+    if mask is not None:
+        weights = np.where(mask, weights, 0.0)
+
+    weighted = np.sum(values * weights, axis=-1) / np.sum(weights, axis=-1)
+    return float(weighted) if weighted.ndim == 0 else weighted
+
+
+def aspect_ratio_intersections(lengths, widths, coords):
+    """
+    Find where the aspect ratio lines through (0, 0) and (length, width) first cross a contour.
+
+    Args:
+        lengths (float or array-like): Glass lengths in mm.
+        widths (float or array-like): Glass widths in mm, broadcastable against lengths.
+        coords (np.ndarray): (M, 2) points of the contour, in contour order.
+
+    Returns:
+        np.ndarray: (..., 2) crossing points, NaN where the line does not cross the contour.
+    """
+    lengths, widths = np.broadcast_arrays(np.asarray(lengths, dtype=float), np.asarray(widths, dtype=float))
+    if len(coords) < 2:
+        return np.full(lengths.shape + (2,), np.nan)
+
+    # Signed offset of every contour point from each line; a segment crosses where the sign changes
+    offsets = coords[:, 1] - coords[:, 0] * widths[..., None] / lengths[..., None]
+    crossing = offsets[..., :-1] * offsets[..., 1:] <= 0
+
+    first = np.argmax(crossing, axis=-1)[..., None]
+    found = np.any(crossing, axis=-1)
+    offset_1 = np.take_along_axis(offsets, first, axis=-1)[..., 0]
+    offset_2 = np.take_along_axis(offsets, first + 1, axis=-1)[..., 0]
+    first = first[..., 0]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = offset_1 / (offset_1 - offset_2)
+    p1 = coords[first]
+    p2 = coords[first + 1]
+    points = p1 + t[..., None] * (p2 - p1)
+    return np.where(found[..., None], points, np.nan)
+
+
+def get_chart_index(layer_type, supported_sides, layer_thickness):
+    """
+    Retrieve the cached index of an NFL chart, rebuilt whenever the chart file changes.
+
+    Returns:
+        ChartIndex or None: The index, or None if the chart file does not hold the expected key.
+    """
+    chart = chart_registry.get_nfl_chart(layer_type, supported_sides, layer_thickness)
+    if chart is None:
+        return None
+    _, json_file_path = chart_registry.nfl_chart_path(layer_type, supported_sides, layer_thickness)
+    return chart_registry.registry.derived(json_file_path, 'chart_index', lambda _: ChartIndex(chart))
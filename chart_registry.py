@@ -0,0 +1,298 @@
+import os
+import re
+import json
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+import chart_bundle
+import timing
+
+# Root of the chart data, relative to the working directory like the rest of the app
+BASE_DIR = os.path.join('.', 'Json')
+
+
+@dataclass(frozen=True)
+class NFLChart:
+    """
+    NFL contour chart (3- or 4-sided support) held as NumPy arrays.
+
+    Attributes:
+        key (str): The top-level key of the chart, e.g. 'NFL6mm4S'.
+        points (np.ndarray): (N, 2) array of the X, Y chart coordinates in file order.
+        nfl (np.ndarray): (N,) array of the NFL value of every point.
+        contours (dict): NFL level -> (M, 2) array of the points of that contour, in file order.
+    """
+    key: str
+    points: np.ndarray
+    nfl: np.ndarray
+    contours: dict
+
+    @property
+    def x(self):
+        return self.points[:, 0]
+
+    @property
+    def y(self):
+        return self.points[:, 1]
+
+    @property
+    def levels(self):
+        return sorted(self.contours)
+
+
+class _Entry:
+    """
+    A loaded chart file. The document is parsed on first use, so bundled charts are never parsed.
+    """
+
+    def __init__(self, mtime, load, derived=None):
+        self.mtime = mtime
+        self.derived = derived or {}
+        self._load = load
+        self._document = None
+        self._lock = threading.Lock()
+        self._build_locks = {}
+
+    @property
+    def document(self):
+        if self._load is not None:
+            with self._lock:
+                if self._load is not None:
+                    with timing.span('json_load'):
+                        self._document = self._load()
+                    self._load = None
+        return self._document
+
+    def build_lock(self, name):
+        """
+        The lock serializing the builds of one derived structure of this file.
+        """
+        with self._lock:
+            return self._build_locks.setdefault(name, threading.Lock())
+
+
+def build_nfl_chart(key, data_list):
+    """
+    Convert the list of {"NFL", "X", "Y"} records of a chart file into an NFLChart.
+
+    Args:
+        key (str): The top-level key the records were stored under.
+        data_list (list): The chart records.
+
+    Returns:
+        NFLChart: The typed chart.
+    """
+    values = np.array([(item['X'], item['Y'], item['NFL']) for item in data_list], dtype=float).reshape(-1, 3)
+    points = np.ascontiguousarray(values[:, :2])
+    nfl = np.ascontiguousarray(values[:, 2])
+
+    # Keep the JSON value (int or float) as the contour key so labels read like the source chart
+    contours = {}
+    for item in data_list:
+        contours.setdefault(item['NFL'], None)
+    for level in contours:
+        contours[level] = np.ascontiguousarray(points[nfl == level])
+
+    return NFLChart(key, points, nfl, contours)
+
+
+def nfl_chart_path(layer_type, supported_sides, layer_thickness, base_dir=BASE_DIR):
+    key = f"NFL{layer_thickness}mm{supported_sides}S"
+    return key, os.path.join(base_dir, 'NFL', f'{layer_type}', f'{supported_sides}Sided', f"{key}.json")
+
+
+class ChartRegistry:
+    """
+    Process-wide cache of the chart files under Json/.
+
+    Every file is parsed once and kept in memory together with any structure derived from it
+    (typed charts, interpolators, ...). A file is re-read when its modification time changes,
+    which also drops everything derived from the old contents.
+
+    When a chart bundle compiled by chart_bundle.py is present, files whose recorded modification
+    time and size still match are served from it instead: NFL charts as memory-mapped arrays,
+    the other files from the JSON text stored in the bundle.
+    """
+
+    def __init__(self, base_dir=BASE_DIR, bundle_path=None):
+        self.base_dir = base_dir
+        self.bundle_path = bundle_path
+        self._bundle = None
+        self._bundle_loaded = False
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    @property
+    def bundle(self):
+        # Opened once per process; a recompiled bundle is picked up on restart
+        if not self._bundle_loaded:
+            with self._lock:
+                if not self._bundle_loaded:
+                    self._bundle = chart_bundle.load_bundle(self.base_dir, self.bundle_path)
+                    self._bundle_loaded = True
+        return self._bundle
+
+    def _entry(self, json_file_path):
+        # The absolute path is only the cache key; errors name the file the way the caller did
+        full_path = os.path.abspath(json_file_path)
+        stat = os.stat(json_file_path)  # Raises FileNotFoundError like open() would
+        mtime = stat.st_mtime_ns
+
+        entry = self._entries.get(full_path)
+        if entry is not None and entry.mtime == mtime:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(full_path)
+            if entry is None or entry.mtime != mtime:
+                entry = self._new_entry(full_path, json_file_path, stat)
+                self._entries[full_path] = entry
+            return entry
+
+    def _new_entry(self, full_path, json_file_path, stat):
+        bundle = self.bundle
+        record = bundle.lookup(full_path, stat) if bundle is not None else None
+        if record is None:
+            def load():
+                with open(json_file_path, 'r') as file:
+                    return json.load(file)
+
+            # Files outside the bundle are parsed right away, like before the bundle existed
+            entry = _Entry(stat.st_mtime_ns, load)
+            entry.document
+            return entry
+
+        derived = {}
+        if record['kind'] == 'nfl':
+            points, nfl, contours = bundle.nfl_arrays(record)
+            derived['nfl_chart'] = NFLChart(record['key'], points, nfl, contours)
+        return _Entry(stat.st_mtime_ns, lambda: bundle.document(record, full_path), derived)
+
+    def read_json(self, json_file_path):
+        """
+        Return the parsed contents of a JSON file. The returned object is shared and must not be modified.
+        """
+        return self._entry(json_file_path).document
+
+    def derived(self, json_file_path, name, build):
+        """
+        Return a structure built from a JSON file, building it on first use.
+
+        Args:
+            json_file_path (str): The JSON file the structure is derived from.
+            name (str): Name of the structure, unique per file.
+            build (callable): Called with the parsed document to build the structure.
+
+        Returns:
+            object: The cached result of build(document), rebuilt whenever the file changes.
+        """
+        entry = self._entry(json_file_path)
+        try:
+            return entry.derived[name]
+        except KeyError:
+            pass
+
+        # Only builds of the same structure wait on each other, not lookups of other charts
+        with entry.build_lock(name):
+            if name not in entry.derived:
+                entry.derived[name] = build(entry.document)
+            return entry.derived[name]
+
+    def get_nfl_chart(self, layer_type, supported_sides, layer_thickness):
+        """
+        Retrieve the NFL chart for the given support and thickness.
+
+        Returns:
+            NFLChart or None: The chart, or None if the file does not hold the expected key.
+        """
+        key, json_file_path = nfl_chart_path(layer_type, supported_sides, layer_thickness, self.base_dir)
+        return self._nfl_chart(json_file_path, key)
+
+    def _nfl_chart(self, json_file_path, key):
+        def build(spec_data):
+            if key not in spec_data:
+                return None
+            return build_nfl_chart(key, spec_data[key])
+
+        return self.derived(json_file_path, 'nfl_chart', build)
+
+    def nfl_chart_thicknesses(self, layer_type, supported_sides):
+        """
+        List the thicknesses that have an NFL chart for a layer type and support.
+
+        Files that do not hold the chart key of their name are left out.
+
+        Returns:
+            list: The thicknesses as written in the file names (e.g. '6', '2.5'), sorted by value. Pass them
+                  on unchanged, since 6 and 6.0 select different files.
+        """
+        directory = os.path.join(self.base_dir, 'NFL', f'{layer_type}', f'{supported_sides}Sided')
+        if not os.path.isdir(directory):
+            return []
+
+        pattern = re.compile(rf'NFL(\d+(?:\.\d+)?)mm{supported_sides}S\.json')
+        thicknesses = [match.group(1) for match in map(pattern.fullmatch, os.listdir(directory)) if match]
+        thicknesses = [thickness for thickness in thicknesses
+                       if self.get_nfl_chart(layer_type, supported_sides, thickness) is not None]
+        return sorted(thicknesses, key=float)
+
+    def iter_nfl_charts(self):
+        """
+        Yield (json_file_path, chart) for every 3- and 4-sided NFL chart file, skipping files without a chart.
+        """
+        for root, _, files in os.walk(os.path.join(self.base_dir, 'NFL')):
+            if not os.path.basename(root).endswith('Sided'):
+                continue
+            for name in sorted(files):
+                if name.endswith('.json'):
+                    json_file_path = os.path.join(root, name)
+                    chart = self._nfl_chart(json_file_path, os.path.splitext(name)[0])
+                    if chart is not None:
+                        yield json_file_path, chart
+
+    def preload(self):
+        """
+        Parse every JSON file under the base directory so requests never pay for it.
+
+        Returns:
+            int: The number of files loaded.
+        """
+        count = 0
+        for root, _, files in os.walk(self.base_dir):
+            for name in files:
+                if name.endswith('.json'):
+                    entry = self._entry(os.path.join(root, name))
+                    # Bundled NFL charts are used as arrays and never need their JSON
+                    if 'nfl_chart' not in entry.derived:
+                        entry.document
+                    count += 1
+
+        # Contour charts are also converted to arrays up front
+        for _ in self.iter_nfl_charts():
+            pass
+        return count
+
+
+registry = ChartRegistry()
+
+
+def read_json(json_file_path):
+    return registry.read_json(json_file_path)
+
+
+def get_nfl_chart(layer_type, supported_sides, layer_thickness):
+    return registry.get_nfl_chart(layer_type, supported_sides, layer_thickness)
+
+
+def nfl_chart_thicknesses(layer_type, supported_sides):
+    return registry.nfl_chart_thicknesses(layer_type, supported_sides)
+
+
+def iter_nfl_charts():
+    return registry.iter_nfl_charts()
+
+
+def preload():
+    return registry.preload()
@@ -0,0 +1,61 @@
+"""
+Import-time budget of the app and the calculation modules.
+
+    python check_import_time.py
+
+Every module is imported in a fresh interpreter with ``-X importtime``. The check fails when an
+import takes longer than its budget, or when it loads one of the heavy dependencies (scipy,
+matplotlib, reportlab) that are meant to be imported on first use.
+"""
+import os
+import sys
+import json
+import subprocess
+
+# Cumulative import time allowed per module, in milliseconds
+BUDGETS_MS = {
+    'app': 700,
+    'panel_calculation': 400,
+    'NFL_COF_1and2Sided': 300,
+    'cof_calculation': 300,
+    'nfl_calculation': 300,
+    'newPlotting': 300,
+}
+HEAVY_MODULES = ('scipy', 'matplotlib', 'reportlab')
+
+
+def measure_import(module, python=sys.executable):
+    """
+    Import a module in a fresh interpreter.
+
+    Returns:
+        tuple: The cumulative import time in ms and the heavy modules the import loaded.
+    """
+    code = (f"import sys, json; import {module}; "
+            f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))")
+    process = subprocess.run([python, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+
+    cumulative_us = None
+    for line in process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative_us = int(parts[1])
+    heavy = json.loads(process.stdout.strip().splitlines()[-1])
+    return cumulative_us / 1000, heavy
+
+
+def main():
+    failed = False
+    for module, budget in BUDGETS_MS.items():
+        elapsed, heavy = measure_import(module)
+        ok = elapsed <= budget and not heavy
+        failed |= not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {module:<20} {elapsed:8.1f} ms (budget {budget} ms)"
+              + (f", loads {', '.join(heavy)}" if heavy else ""))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
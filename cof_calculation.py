@@ -1,6 +1,12 @@
 import os
-import json
 import math
+import numpy as np
+import chart_registry
+import thickness_catalogue
+import timing
+
+GLASS_THICKNESSES_PATH = os.path.join("./Json/Glass_Thicknesses.json")
+SGP_MODULUS_OF_ELASTICITY = 78000000
 
 
 def load_glass_thickness_data(json_file_path):
@@ -15,9 +21,7 @@ def load_glass_thickness_data(json_file_path):
     - None if the file is not found or an error occurs.
     """
     try:
-        with open(json_file_path, 'r') as file:
-            spec_data = json.load(file)
-            return spec_data
+        return chart_registry.read_json(json_file_path)
     except FileNotFoundError as fnf_error:
         print(f"File not found error: {fnf_error}")
         return None
@@ -26,24 +30,23 @@ def load_glass_thickness_data(json_file_path):
         return None
 
 
-def get_minimum_thickness(nominal_thickness, spec_data):
+def get_minimum_thickness(nominal_thickness, json_file_path=GLASS_THICKNESSES_PATH):
     """
-    Retrieve the minimum glass thickness for the given nominal thickness from the spec_data.
+    Retrieve the minimum glass thickness for the given nominal thickness from the glass thickness data.
 
     Parameters:
     - nominal_thickness (float): The nominal thickness of the glass.
-    - spec_data (dict): The data containing nominal and minimum thickness mappings.
+    - json_file_path (str): The JSON file with the nominal and minimum thickness mappings.
 
     Returns:
     - minimum_thickness (float): The minimum glass thickness if found.
-    - None if no corresponding minimum thickness is found.
+    - None if no corresponding minimum thickness is found, counted in the minimum_thickness_misses metric.
     """
-    thickness = float(nominal_thickness)
-    for glass in spec_data["Glass_Thicknesses"]:
-        if float(glass["Nominal_mm"]) == thickness:
-            return float(glass["Minimum_mm"])
-    print(f"No corresponding minimum thickness found for nominal thickness {nominal_thickness}")
-    return None
+    table = thickness_catalogue.get_minimum_thickness_table(json_file_path)
+    minimum_thickness = table.exact(float(nominal_thickness))
+    if minimum_thickness is None:
+        timing.increment('minimum_thickness_misses')
+    return minimum_thickness
 
 
 def calculate_x_value(literal_load, length, width, modulus_of_elasticity, thickness):
@@ -112,14 +115,15 @@ def calculate_cof(literal_load, length, width, modulus_of_elasticity, nominal_th
     - None if an error occurs during processing.
     """
 
-    # Load glass thickness data from JSON
-    json_file_path = os.path.join("./Json/Glass_Thicknesses.json")
-    spec_data = load_glass_thickness_data(json_file_path)
-    if not spec_data:
+    # Get minimum thickness corresponding to the nominal thickness from the glass thickness data
+    try:
+        minimum_thickness = get_minimum_thickness(nominal_thickness, GLASS_THICKNESSES_PATH)
+    except FileNotFoundError as fnf_error:
+        print(f"File not found error: {fnf_error}")
+        return None
+    except ValueError as e:
+        print(f"An error occurred while loading the JSON file: {e}")
         return None
-
-    # Get minimum thickness corresponding to the nominal thickness
-    minimum_thickness = get_minimum_thickness(nominal_thickness, spec_data)
     if minimum_thickness is None:
         return None
 
@@ -128,11 +132,68 @@ def calculate_cof(literal_load, length, width, modulus_of_elasticity, nominal_th
 
     # Calculate the x-value for the COF equation
     if interlayerTypes == ["SGP"]:
-        modulus_of_elasticity = 78000000
+        modulus_of_elasticity = SGP_MODULUS_OF_ELASTICITY
     x = calculate_x_value(literal_load, length, width, modulus_of_elasticity, minimum_thickness)
     # Calculate and return the center of deflection (COF)
     cof = calculate_center_of_deflection(r0, r1, r2, minimum_thickness, x)
 
     return cof
 
-print(calculate_x_value(1.5, 1500, 1000, 71700000, 12))
\ No newline at end of file
+
+def get_minimum_thickness_table():
+    """
+    Retrieve the nominal and minimum glass thicknesses as arrays sorted by nominal thickness.
+
+    Returns:
+    - (nominal, minimum) (tuple of np.ndarray): Built once per version of Glass_Thicknesses.json.
+    """
+    table = thickness_catalogue.get_minimum_thickness_table(GLASS_THICKNESSES_PATH)
+    return table.keys, table.values
+
+
+def get_minimum_thickness_array(nominal_thickness):
+    """
+    Vectorized form of get_minimum_thickness.
+
+    Parameters:
+    - nominal_thickness (array-like): Nominal thicknesses of the glass.
+
+    Returns:
+    - minimum_thickness (np.ndarray): The minimum thicknesses, NaN where the nominal thickness is not listed.
+    """
+    return thickness_catalogue.get_minimum_thickness_table(GLASS_THICKNESSES_PATH).exact_array(nominal_thickness)
+
+
+def calculate_cof_array(literal_load, length, width, modulus_of_elasticity, nominal_thickness, interlayerTypes=None):
+    """
+    Vectorized form of calculate_cof for screening many design points at once.
+
+    Parameters:
+    - literal_load (array-like): The literal loads applied to the glass.
+    - length (array-like): The lengths of the glass in mm.
+    - width (array-like): The widths of the glass in mm.
+    - modulus_of_elasticity (float): The modulus of elasticity of the glass.
+    - nominal_thickness (array-like): The nominal thicknesses of the glass in mm.
+    - interlayerTypes (list, optional): The interlayer types, ["SGP"] switches to the SGP modulus.
+
+    All array arguments are broadcast against each other.
+
+    Returns:
+    - (cof, valid) (tuple of np.ndarray): The center of glass deflection in mm and a mask of the points where
+      it could be calculated. Points where calculate_cof would fail (unknown thickness, or a load too small
+      for the double logarithm) are NaN instead of raising.
+    """
+    if interlayerTypes == ["SGP"]:
+        modulus_of_elasticity = SGP_MODULUS_OF_ELASTICITY
+
+    literal_load, length, width, nominal_thickness = np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in (literal_load, length, width, nominal_thickness)))
+    minimum_thickness = get_minimum_thickness_array(nominal_thickness)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        r0, r1, r2 = calculate_coefficients(length, width)
+        x = np.log(np.log((literal_load * (length * width) ** 2) / (modulus_of_elasticity * minimum_thickness ** 4)))
+        cof = minimum_thickness * np.exp(r0 + r1 * x + r2 * x ** 2)
+
+    valid = np.isfinite(x) & np.isfinite(cof)
+    return np.where(valid, cof, np.nan), valid
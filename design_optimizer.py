@@ -0,0 +1,146 @@
+import numpy as np
+
+import chart_registry
+from cof_calculation import calculate_cof_array, get_minimum_thickness_array, SGP_MODULUS_OF_ELASTICITY
+from nfl_calculation import calculate_nfl_batch
+from get_gtf import get_gtf_value
+from glass_weight import calculate_glass_weight
+
+MODULUS_OF_ELASTICITY = 71700000
+
+LAYER_TYPES = ('mono', 'laminated')
+# Interlayers considered per layer type, None for monolithic glass
+INTERLAYERS = {'mono': (None,), 'laminated': ('PVB', 'SGP')}
+# Heat treatments from the cheapest to the most expensive, the index is the treatment rank
+HEAT_TREATMENTS = ('annealed', 'heatStrengthened', 'tempered')
+
+
+def _build_ups(layer_types, heat_treatments):
+    return [(layer_type, interlayer, treatment)
+            for layer_type in layer_types
+            for interlayer in INTERLAYERS[layer_type]
+            for treatment in heat_treatments]
+
+
+class _NFLTable:
+    """
+    NFL of one panel per (layer type, chart thickness), interpolated on first use.
+    """
+
+    def __init__(self, length, width, supported_sides):
+        self.length = length
+        self.width = width
+        self.supported_sides = supported_sides
+        self._values = {}
+
+    def get(self, layer_type, thickness):
+        key = (layer_type, thickness)
+        if key not in self._values:
+            self._values[key] = float(calculate_nfl_batch(self.length, self.width, self.supported_sides,
+                                                          thickness, layer_type))
+        return self._values[key]
+
+
+def optimize_design(length, width, short_load, long_load=0, allowable_deflection=20, supported_sides=4,
+                    interlayer_thickness=1.52, layer_types=LAYER_TYPES, heat_treatments=HEAT_TREATMENTS):
+    """
+    Find the thinnest passing thickness of every single glazed build-up and the Pareto set among them.
+
+    A build-up is a layer type (mono or laminated), an interlayer (PVB or SGP for laminated glass) and a
+    heat treatment. A thickness passes when the center of glass deflection (COF) under the short and long
+    duration loads is within allowable_deflection, and the load resistance LR = NFL x GTF (the load share
+    factor is 1 for single glazing) is at least the short and long duration load.
+
+    The criteria are not monotone in the thickness: the NFL is 0 where a panel is outside the chart of a
+    thick glass, and the COF has no value when the load is too small for the glass (calculate_cof raises
+    there). Every build-up is therefore checked at all its chart thicknesses, in one vectorized COF call
+    over the whole grid, with every NFL interpolated once per layer type and thickness.
+
+    Args:
+        length (float): Glass length in mm.
+        width (float): Glass width in mm.
+        short_load (float): Short duration (3 s) load in kPa.
+        long_load (float): Long duration (30 days) load in kPa, 0 if there is none.
+        allowable_deflection (float): Allowable center of glass deflection in mm.
+        supported_sides (int): Number of supported sides, only 4-sided charts exist for both layer types.
+        interlayer_thickness (float): Interlayer thickness of laminated glass in mm, used for the weight.
+        layer_types (tuple): The layer types to consider.
+        heat_treatments (tuple): The heat treatments to consider, from the cheapest to the most expensive.
+
+    Returns:
+        dict: 'candidates', the thinnest passing design of every build-up that has one, and 'pareto', the
+              candidates not beaten on both weight and heat treatment rank, lightest first. Each design is a
+              dict with thickness, layer_type, interlayer, heat_treatment, treatment_rank, weight, nfl, lr,
+              short_cof and long_cof.
+    """
+    # The charts and the COF coefficients take the long side first
+    length, width = max(length, width), min(length, width)
+    build_ups = _build_ups(layer_types, heat_treatments)
+    # Only thicknesses with both an NFL chart and a listed minimum thickness can be checked
+    thicknesses = {layer_type: [thickness for thickness in chart_registry.nfl_chart_thicknesses(layer_type,
+                                                                                               supported_sides)
+                                if not np.isnan(get_minimum_thickness_array(float(thickness)))]
+                   for layer_type in layer_types}
+    gtf = {treatment: get_gtf_value([treatment], 'single') for treatment in heat_treatments}
+    nfl_table = _NFLTable(length, width, supported_sides)
+
+    modulus = np.array([SGP_MODULUS_OF_ELASTICITY if interlayer == 'SGP' else MODULUS_OF_ELASTICITY
+                        for _, interlayer, _ in build_ups], dtype=float)
+    gtf_short = np.array([gtf[treatment]['short'][0] for _, _, treatment in build_ups], dtype=float)
+    gtf_long = np.array([gtf[treatment]['long'][0] for _, _, treatment in build_ups], dtype=float)
+
+    # Grid of every (build-up, thickness) pair, flattened
+    rows = np.concatenate([np.full(len(thicknesses[layer_type]), row)
+                           for row, (layer_type, _, _) in enumerate(build_ups)]).astype(int)
+    labels = [label for layer_type, _, _ in build_ups for label in thicknesses[layer_type]]
+    nfl = np.array([nfl_table.get(build_ups[row][0], label) for row, label in zip(rows, labels)])
+    nominal = np.array([float(label) for label in labels])
+
+    short_cof, valid = calculate_cof_array(short_load, length, width, modulus[rows], nominal)
+    passed = valid & (short_cof <= allowable_deflection) & (nfl * gtf_short[rows] >= short_load)
+    long_cof = np.full(len(rows), np.nan)
+    if long_load != 0:
+        long_cof, long_valid = calculate_cof_array(long_load, length, width, modulus[rows], nominal)
+        passed &= long_valid & (long_cof <= allowable_deflection) & (nfl * gtf_long[rows] >= long_load)
+
+    candidates = []
+    for row, (layer_type, interlayer, treatment) in enumerate(build_ups):
+        indices = np.flatnonzero(passed & (rows == row))
+        if not len(indices):
+            continue
+        # Thicknesses are sorted, so the first passing one is the thinnest
+        i = indices[0]
+        weight = calculate_glass_weight(length, width, [nominal[i]], [layer_type],
+                                        pvb_thicknesses=[interlayer_thickness])
+        candidates.append({
+            'thickness': float(nominal[i]),
+            'layer_type': layer_type,
+            'interlayer': interlayer,
+            'heat_treatment': treatment,
+            'treatment_rank': heat_treatments.index(treatment),
+            'weight': weight,
+            'nfl': round(float(nfl[i]), 2),
+            'lr': {'short': round(float(nfl[i] * gtf_short[row]), 2),
+                   'long': round(float(nfl[i] * gtf_long[row]), 2)},
+            'short_cof': round(float(short_cof[i]), 2),
+            'long_cof': None if np.isnan(long_cof[i]) else round(float(long_cof[i]), 2),
+        })
+
+    return {'candidates': candidates, 'pareto': pareto_front(candidates)}
+
+
+def pareto_front(candidates, objectives=('weight', 'treatment_rank')):
+    """
+    Keep the candidates that no other candidate matches or beats on every objective (lower is better).
+
+    Of candidates with identical objectives only the first is kept.
+
+    Returns:
+        list: The non-dominated candidates, sorted by the objectives.
+    """
+    front = []
+    for candidate in sorted(candidates, key=lambda c: tuple(c[name] for name in objectives)):
+        values = tuple(candidate[name] for name in objectives)
+        if not any(all(kept[name] <= value for name, value in zip(objectives, values)) for kept in front):
+            front.append(candidate)
+    return front
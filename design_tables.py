@@ -0,0 +1,335 @@
+"""
+Precomputed NFL and COF lookup tables of the 4-sided charts.
+
+    python design_tables.py                      # build Json/design_tables.npz and report its accuracy
+    python design_tables.py --size 257           # denser NFL grids
+    python design_tables.py --check              # only report the accuracy of the existing tables
+
+The NFL of every chart is tabulated on a log-spaced grid of (long side, short side) spanning the chart.
+The COF only depends on the aspect ratio and x = ln(ln(q (a b)^2 / (E t^4))), so a single table of
+ln(COF / t) on a grid of (ln ratio, x) covers every thickness, modulus and load. The grids are uniform
+in their (log) coordinates, so a lookup computes the cell index directly: O(1) per point, vectorized.
+"""
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+import chart_registry
+from cof_calculation import (calculate_cof_array, get_minimum_thickness_array, calculate_coefficients,
+                             SGP_MODULUS_OF_ELASTICITY)
+from nfl_calculation import calculate_nfl_batch, get_nfl_interpolators
+
+MODULUS_OF_ELASTICITY = 71700000
+TABLES_PATH = os.path.join(chart_registry.BASE_DIR, 'design_tables.npz')
+
+LAYER_TYPES = ('mono', 'laminated')
+SUPPORTED_SIDES = 4
+# Grid points per axis of the NFL tables
+NFL_SIZE = 161
+# COF table: aspect ratio (length / width, as calculate_cof uses it) and x ranges, and points per axis
+COF_RATIO_RANGE = (0.2, 5.0)
+COF_X_RANGE = (-6.0, 3.5)
+COF_SIZE = (201, 201)
+
+# Lookup modes: 'linear' interpolates the values, 'log' their logarithm (log-log on the log-spaced axes)
+MODES = ('linear', 'log')
+
+
+def thickness_label(thickness):
+    """
+    The chart label of a nominal thickness: 6 -> '6', 2.5 -> '2.5'.
+    """
+    return f"{float(thickness):g}"
+
+
+def _axis(start, stop, size):
+    return {'start': float(start), 'step': float((stop - start) / (size - 1)), 'size': int(size)}
+
+
+def _axis_points(axis):
+    return axis['start'] + axis['step'] * np.arange(axis['size'])
+
+
+def build_tables(path=TABLES_PATH, nfl_size=NFL_SIZE, layer_types=LAYER_TYPES):
+    """
+    Tabulate the NFL of every 4-sided chart and the COF, and save them as one .npz file.
+
+    Args:
+        path (str): Where to write the tables.
+        nfl_size (int): Grid points per axis of every NFL table.
+        layer_types (tuple): The layer types whose charts are tabulated.
+
+    Returns:
+        DesignTables: The tables that were written.
+    """
+    arrays = {}
+    meta = {'supported_sides': SUPPORTED_SIDES, 'nfl': {}, 'cof': {}}
+
+    for layer_type in layer_types:
+        for label in chart_registry.nfl_chart_thicknesses(layer_type, SUPPORTED_SIDES):
+            chart = chart_registry.get_nfl_chart(layer_type, SUPPORTED_SIDES, label)
+            # The chart x axis is the long side of the panel, y the short side
+            axes = [_axis(np.log(chart.x.min()), np.log(chart.x.max()), nfl_size),
+                    _axis(np.log(chart.y.min()), np.log(chart.y.max()), nfl_size)]
+            long_sides, short_sides = np.meshgrid(np.exp(_axis_points(axes[0])), np.exp(_axis_points(axes[1])),
+                                                  indexing='ij')
+            name = f"nfl/{layer_type}/{label}"
+            interpolators = get_nfl_interpolators(layer_type, SUPPORTED_SIDES, label)
+            # NaN outside the chart, so the cells on its edge are known to be uncovered
+            arrays[name] = interpolators.cubic(long_sides, short_sides).astype(np.float32)
+            meta['nfl'][name] = axes
+
+    axes = [_axis(np.log(COF_RATIO_RANGE[0]), np.log(COF_RATIO_RANGE[1]), COF_SIZE[0]),
+            _axis(COF_X_RANGE[0], COF_X_RANGE[1], COF_SIZE[1])]
+    ratios, x = np.meshgrid(np.exp(_axis_points(axes[0])), _axis_points(axes[1]), indexing='ij')
+    r0, r1, r2 = calculate_coefficients(ratios, 1.0)
+    # ln(COF / t); the log mode interpolates this directly, the linear mode its exponent
+    arrays['cof'] = r0 + r1 * x + r2 * x ** 2
+    meta['cof'] = axes
+
+    arrays['meta'] = np.array(json.dumps(meta))
+    np.savez_compressed(path, **arrays)
+    return DesignTables(arrays, meta)
+
+
+def _inside(axes, coordinates):
+    inside = True
+    for axis, coordinate in zip(axes, coordinates):
+        position = (coordinate - axis['start']) / axis['step']
+        inside = inside & (position >= 0) & (position <= axis['size'] - 1)
+    return inside
+
+
+def _interpolate(values, axes, coordinates, mode, empty=np.nan):
+    """
+    Bilinear interpolation on a uniform grid, NaN outside it.
+
+    Args:
+        values (np.ndarray): The (n, m) grid values.
+        axes (list): The two axis dicts (start, step, size).
+        coordinates (tuple): The two arrays of point coordinates, in the axis units.
+        mode (str): 'linear' or 'log'. Cells with a value <= 0 fall back to linear in the log mode.
+        empty (float): The value in the cells whose corners are all NaN.
+
+    Returns:
+        np.ndarray: The interpolated values, NaN in the cells with some NaN corners.
+    """
+    indices = []
+    fractions = []
+    for axis, coordinate in zip(axes, coordinates):
+        position = (coordinate - axis['start']) / axis['step']
+        index = np.clip(np.floor(np.nan_to_num(position)).astype(int), 0, axis['size'] - 2)
+        indices.append(index)
+        fractions.append(position - index)
+
+    i, j = indices
+    u, v = fractions
+    corners = np.stack([values[i, j], values[i + 1, j], values[i, j + 1], values[i + 1, j + 1]]).astype(float)
+    weights = np.stack([(1 - u) * (1 - v), u * (1 - v), (1 - u) * v, u * v])
+    result = np.sum(corners * weights, axis=0)
+
+    if mode == 'log':
+        positive = np.all(corners > 0, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_result = np.exp(np.sum(np.log(corners) * weights, axis=0))
+        result = np.where(positive, log_result, result)
+    result = np.where(np.all(np.isnan(corners), axis=0), empty, result)
+    return np.where(_inside(axes, coordinates), result, np.nan)
+
+
+class DesignTables:
+    """
+    Runtime lookups in the tables written by build_tables.
+    """
+
+    def __init__(self, arrays, meta):
+        self.arrays = arrays
+        self.meta = meta
+
+    def has_nfl(self, layer_type, thickness):
+        return f"nfl/{layer_type}/{thickness_label(thickness)}" in self.meta['nfl']
+
+    def nfl(self, lengths, widths, thickness, layer_type, mode='linear', exact_fallback=True):
+        """
+        Table form of calculate_nfl_batch for 4-sided panels.
+
+        The grid cells crossing the edge of the chart have no table value; those panels are calculated
+        exactly, or NaN when exact_fallback is False.
+
+        Args:
+            lengths (array-like): Glass lengths in mm.
+            widths (array-like): Glass widths in mm, broadcastable against lengths.
+            thickness (float or str): Nominal glass thickness in mm.
+            layer_type (str): Either "mono" or "laminated".
+            mode (str): 'linear' or 'log'.
+            exact_fallback (bool): Calculate the panels on the edge of the chart with calculate_nfl_batch.
+
+        Returns:
+            np.ndarray: The NFL of every panel, 0 where the panel lies outside the chart.
+        """
+        name = f"nfl/{layer_type}/{thickness_label(thickness)}"
+        if name not in self.meta['nfl']:
+            raise ValueError(f"Data not found for the given parameters: "
+                             f"NFL{thickness_label(thickness)}mm{SUPPORTED_SIDES}S")
+
+        lengths, widths = np.broadcast_arrays(np.asarray(lengths, dtype=float), np.asarray(widths, dtype=float))
+        long_sides = np.maximum(lengths, widths)
+        short_sides = np.minimum(lengths, widths)
+        long_sides = np.where(long_sides == short_sides, long_sides + 10, long_sides)
+
+        coordinates = (np.log(long_sides), np.log(short_sides))
+        nfl = _interpolate(self.arrays[name], self.meta['nfl'][name], coordinates, mode, empty=0.0)
+        uncovered = np.isnan(nfl) & _inside(self.meta['nfl'][name], coordinates)
+        nfl = np.where(np.isnan(nfl) & ~uncovered, 0.0, nfl)
+        if exact_fallback and uncovered.any():
+            nfl[uncovered] = calculate_nfl_batch(long_sides[uncovered], short_sides[uncovered], SUPPORTED_SIDES,
+                                                 thickness_label(thickness), layer_type)
+        return nfl
+
+    def cof(self, literal_load, length, width, modulus_of_elasticity, nominal_thickness, mode='log'):
+        """
+        Table form of calculate_cof_array.
+
+        Returns:
+            tuple: The COF in mm and the mask of valid points, like calculate_cof_array. Points outside the
+                   table are NaN and not valid as well.
+        """
+        literal_load, length, width, modulus_of_elasticity, nominal_thickness = np.broadcast_arrays(
+            *(np.asarray(value, dtype=float)
+              for value in (literal_load, length, width, modulus_of_elasticity, nominal_thickness)))
+        minimum_thickness = get_minimum_thickness_array(nominal_thickness)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = np.log(np.log((literal_load * (length * width) ** 2) /
+                              (modulus_of_elasticity * minimum_thickness ** 4)))
+            if mode == 'log':
+                log_ratio = _interpolate(self.arrays['cof'], self.meta['cof'], (np.log(length / width), x), 'linear')
+                cof = minimum_thickness * np.exp(log_ratio)
+            else:
+                ratio = _interpolate(np.exp(self.arrays['cof'].astype(float)), self.meta['cof'],
+                                     (np.log(length / width), x), 'linear')
+                cof = minimum_thickness * ratio
+
+        valid = np.isfinite(cof)
+        return np.where(valid, cof, np.nan), valid
+
+
+_loaded = {}
+
+
+def load_tables(path=TABLES_PATH):
+    """
+    Load the tables, once per version of the file.
+
+    Returns:
+        DesignTables: The tables, or None if the file does not exist.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != mtime:
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files if name != 'meta'}
+            meta = json.loads(str(data['meta']))
+        cached = _loaded[path] = (mtime, DesignTables(arrays, meta))
+    return cached[1]
+
+
+def _errors(table_values, exact_values, mask):
+    error = np.abs(table_values - exact_values)[mask]
+    exact_values = exact_values[mask]
+    relative = error[exact_values > 0] / exact_values[exact_values > 0]
+    return {'points': int(mask.sum()),
+            'max_abs': float(error.max()) if len(error) else 0.0,
+            'max_rel': float(relative.max()) if len(relative) else 0.0}
+
+
+def check_tables(tables, samples=20000, seed=0):
+    """
+    Compare table lookups against the exact calculation at random points.
+
+    The NFL is compared with calculate_nfl_batch (the vectorized calculate_nfl) at panels log-uniformly
+    spread over every chart, leaving out the panels on the edge of the chart, which are calculated
+    exactly anyway. The COF is compared with calculate_cof_array over 0.2 - 10 kPa loads, 300 - 5000 mm
+    sides and both moduli, at the points where the exact deflection is between 0.1 and 1000 mm.
+
+    Returns:
+        dict: Per mode, the number of compared points and the maximum absolute and relative errors of
+              the NFL ('nfl', plus one entry per chart) and of the COF ('cof'), and the fraction of the
+              panels on the chart edges ('nfl_fallback').
+    """
+    random = np.random.default_rng(seed)
+    report = {mode: {'nfl_charts': {}} for mode in MODES}
+
+    nfl_table = {mode: [] for mode in MODES}
+    nfl_exact = []
+    for name, axes in tables.meta['nfl'].items():
+        _, layer_type, label = name.split('/')
+        long_sides, short_sides = (np.exp(random.uniform(axis['start'], _axis_points(axis)[-1], samples))
+                                   for axis in axes)
+        keep = short_sides < long_sides
+        long_sides, short_sides = long_sides[keep], short_sides[keep]
+        exact = calculate_nfl_batch(long_sides, short_sides, SUPPORTED_SIDES, label, layer_type)
+        nfl_exact.append(exact)
+        for mode in MODES:
+            values = tables.nfl(long_sides, short_sides, label, layer_type, mode=mode, exact_fallback=False)
+            nfl_table[mode].append(values)
+            report[mode]['nfl_charts'][name] = _errors(values, exact, ~np.isnan(values))
+
+    nfl_exact = np.concatenate(nfl_exact)
+    thicknesses = np.array(sorted({float(name.split('/')[2]) for name in tables.meta['nfl']}))
+    loads = random.uniform(0.2, 10, samples)
+    lengths = random.uniform(300, 5000, samples)
+    widths = random.uniform(300, 5000, samples)
+    moduli = random.choice([MODULUS_OF_ELASTICITY, SGP_MODULUS_OF_ELASTICITY], samples)
+    nominal = random.choice(thicknesses, samples)
+    cof_exact, valid = calculate_cof_array(loads, lengths, widths, moduli, nominal)
+
+    for mode in MODES:
+        values = np.concatenate(nfl_table[mode])
+        report[mode]['nfl'] = _errors(values, nfl_exact, ~np.isnan(values))
+        report[mode]['nfl_fallback'] = float(np.isnan(values).mean())
+        cof, table_valid = tables.cof(loads, lengths, widths, moduli, nominal, mode=mode)
+        report[mode]['cof'] = _errors(cof, cof_exact, valid & table_valid & (cof_exact >= 0.1) & (cof_exact <= 1000))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the NFL and COF lookup tables of the 4-sided charts.")
+    parser.add_argument('--output', default=TABLES_PATH, help=f"tables file (default {TABLES_PATH})")
+    parser.add_argument('--size', type=int, default=NFL_SIZE, help=f"NFL grid points per axis (default {NFL_SIZE})")
+    parser.add_argument('--samples', type=int, default=20000, help="random points per check (default 20000)")
+    parser.add_argument('--check', action='store_true', help="only check the existing tables")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        tables = load_tables(args.output)
+        if tables is None:
+            print(f"{args.output} not found")
+            return 1
+    else:
+        tables = build_tables(args.output, nfl_size=args.size)
+        print(f"Wrote {args.output} ({os.path.getsize(args.output) / 1024:.0f} KiB)")
+
+    report = check_tables(tables, samples=args.samples)
+    for mode in MODES:
+        for name, errors in report[mode]['nfl_charts'].items():
+            print(f"{mode:<7} {name:<20} max abs {errors['max_abs']:.4f} kPa  max rel {errors['max_rel']:.2%}")
+        for name in ('nfl', 'cof'):
+            errors = report[mode][name]
+            unit = 'kPa' if name == 'nfl' else 'mm'
+            print(f"{mode:<7} {name.upper() + ' (all)':<20} max abs {errors['max_abs']:.4f} {unit}  "
+                  f"max rel {errors['max_rel']:.2%}  ({errors['points']} points)")
+        print(f"{mode:<7} NFL panels on chart edges (calculated exactly): {report[mode]['nfl_fallback']:.2%}")
+    return 0
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.exit(main())
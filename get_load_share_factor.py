@@ -1,5 +1,5 @@
-import json
 import os
+import chart_registry
 
 def get_load_share_factor(layer_thicknesses, layer_types):
     """
@@ -23,8 +23,7 @@ def get_load_share_factor(layer_thicknesses, layer_types):
 
     # Function to retrieve the LSF values from the given JSON file
     def load_lsf(json_file):
-        with open(json_file, 'r') as file:
-            data = json.load(file)
+        data = chart_registry.read_json(json_file)
 
         try:
             lsf_value = data["Load_Share_Factors"][first_layer_thickness][second_layer_thickness]
@@ -1,46 +1,4 @@
-import math
-
-# Define the glass thickness and corresponding weight (in kg/m²) based on the first table
-GLASS_WEIGHT_MAP = {
-    2.5: 5.7,
-    3.0: 7.6,
-    4.0: 9.9,
-    5.0: 11.9,
-    6.0: 14.6,
-    8.0: 19.5,
-    10.0: 24.4,
-    12.0: 31.2,
-    16.0: 39.5,
-    19.0: 47.8,
-    20.0: 50.19
-}
-
-# Define the interlayer thickness and corresponding weight (in kg/m²) based on the second table
-INTERLAYER_WEIGHT_MAP = {
-    0.38: 0.40,
-    0.76: 0.84,
-    1.14: 1.20,
-    1.52: 1.60,
-    1.524: 1.6,
-    2.29: 2.50
-}
-
-
-# Helper function to find the closest thickness in the weight map
-def find_closest_value(thickness, weight_map):
-    """
-    Finds the closest available thickness from the weight map if the exact thickness is not found.
-
-    Args:
-        thickness (float): The thickness for which to find the closest match.
-        weight_map (dict): The map containing thickness-weight pairs.
-
-    Returns:
-        float: The weight corresponding to the closest thickness.
-    """
-    # Find the closest thickness available in the map using absolute difference
-    closest_thickness = min(weight_map.keys(), key=lambda x: abs(x - thickness))
-    return weight_map[closest_thickness]
+from thickness_catalogue import glass_weight_per_m2, interlayer_weight_per_m2
 
 
 def calculate_glass_weight(glass_length, glass_width, layers_thickness, glass_types, pvb_thicknesses=None):
@@ -68,13 +26,8 @@ def calculate_glass_weight(glass_length, glass_width, layers_thickness, glass_ty
 
     # Iterate over each layer's thickness and glass type
     for i, (thickness, glass_type) in enumerate(zip(layers_thickness, glass_types)):
-        # Check if the thickness is available in the GLASS_WEIGHT_MAP
-        if thickness in GLASS_WEIGHT_MAP:
-            weight_per_m2 = GLASS_WEIGHT_MAP[thickness]
-        else:
-            # If the thickness is not found, find the closest available thickness
-            weight_per_m2 = find_closest_value(thickness, GLASS_WEIGHT_MAP)
-            print(f"Thickness {thickness} mm not found in GLASS_WEIGHT_MAP. Using closest value.")
+        # The closest listed thickness is used if this one is not listed (counted in the glass_weight_misses metric)
+        weight_per_m2 = glass_weight_per_m2(thickness)
 
         # Calculate the weight of the glass layer based on area
         weight = weight_per_m2 * area
@@ -82,16 +35,8 @@ def calculate_glass_weight(glass_length, glass_width, layers_thickness, glass_ty
 
         # If the glass is laminated and pvb_thicknesses are provided, calculate interlayer weight
         if glass_type == 'laminated' and i < len(pvb_thicknesses):
-            pvb_thickness = pvb_thicknesses[i]
-            if pvb_thickness in INTERLAYER_WEIGHT_MAP:
-                interlayer_weight_per_m2 = INTERLAYER_WEIGHT_MAP[pvb_thickness]
-            else:
-                # If the PVB thickness is not found, find the closest available thickness
-                interlayer_weight_per_m2 = find_closest_value(pvb_thickness, INTERLAYER_WEIGHT_MAP)
-                print(f"PVB thickness {pvb_thickness} mm not found in INTERLAYER_WEIGHT_MAP. Using closest value.")
-
-            # Calculate the interlayer (PVB) weight and add it to the total weight
-            interlayer_weight = interlayer_weight_per_m2 * area
+            # The closest listed PVB thickness is used if this one is not listed (interlayer_weight_misses metric)
+            interlayer_weight = interlayer_weight_per_m2(pvb_thicknesses[i]) * area
             total_weight += interlayer_weight
 
     # Return the total weight rounded to two decimal places
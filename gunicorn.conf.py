@@ -0,0 +1,25 @@
+import os
+
+import report_jobs
+
+# gunicorn -c gunicorn.conf.py
+# The application is created and warmed up once in the master before the worker is forked from it.
+#
+# The report jobs (report_jobs) and the rendered plots and reports (artifacts) live in the memory of
+# the process that made them, so a /report/<job_id> or /download/<artifact_id>/<file> request must
+# reach that same process. The deployment is therefore pinned to a single worker, which serves
+# requests concurrently on threads. Scale out with more threads, or with more single-worker
+# instances behind sticky sessions; never with more workers per instance.
+wsgi_app = 'app:create_app()'
+preload_app = True
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = 1
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+
+def post_fork(server, worker):
+    # Threads do not survive fork(); make sure every worker starts its own report pool
+    report_jobs.shutdown(wait=False)
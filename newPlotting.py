@@ -1,13 +1,11 @@
 import os
+import io
+import re
+import threading
 import numpy as np
-import matplotlib.pyplot as plt
 from collections import defaultdict
-from scipy.spatial import cKDTree
-import json
-
-# Set the Matplotlib backend to 'Agg' to avoid Tkinter issues
-plt.switch_backend('Agg')
-
+import chart_registry
+import chart_index
 
 # Calculate the NFL value using distance-based interpolation
 
@@ -37,6 +35,47 @@ def catmull_rom_spline(P0, P1, P2, P3, n_points=200):
     return C
 
 
+# Compute the Catmull-Rom splines of many segments at once
+def catmull_rom_splines(segments, n_points=200):
+    """
+    Vectorized catmull_rom_spline over stacked segments.
+
+    Args:
+        segments (array-like): Control points P0, P1, P2, P3 of each segment, shape (N, 4, 2).
+        n_points (int): Number of points generated per segment.
+
+    Returns:
+        np.ndarray: The curve points of each segment, shape (N, n_points, 2). Segments with coincident
+                    control points are returned as a straight line from P1 to P2.
+    """
+    alpha = 0.5
+    segments = np.asarray(segments, dtype=float)
+    P0, P1, P2, P3 = (segments[:, i, None, :] for i in range(4))
+
+    t0 = np.zeros(len(segments))
+    t1 = np.linalg.norm(segments[:, 1] - segments[:, 0], axis=1) ** alpha + t0
+    t2 = np.linalg.norm(segments[:, 2] - segments[:, 1], axis=1) ** alpha + t1
+    t3 = np.linalg.norm(segments[:, 3] - segments[:, 2], axis=1) ** alpha + t2
+
+    degenerate = (t1 == t0) | (t2 == t1) | (t3 == t2)
+    # Dummy knots keep the divisions finite, the degenerate segments are replaced below
+    t1 = np.where(degenerate, 1.0, t1)
+    t2 = np.where(degenerate, 2.0, t2)
+    t3 = np.where(degenerate, 3.0, t3)
+
+    t = np.linspace(t1, t2, n_points, axis=1)[:, :, None]
+    t0, t1, t2, t3 = (k[:, None, None] for k in (t0, t1, t2, t3))
+    A1 = ((t1 - t) * P0 + (t - t0) * P1) / (t1 - t0)
+    A2 = ((t2 - t) * P1 + (t - t1) * P2) / (t2 - t1)
+    A3 = ((t3 - t) * P2 + (t - t2) * P3) / (t3 - t2)
+    B1 = ((t2 - t) * A1 + (t - t0) * A2) / (t2 - t0)
+    B2 = ((t3 - t) * A2 + (t - t1) * A3) / (t3 - t1)
+    C = ((t2 - t) * B1 + (t - t1) * B2) / (t2 - t1)
+
+    line = P1 + (P2 - P1) * np.linspace(0, 1, n_points)[None, :, None]
+    return np.where(degenerate[:, None, None], line, C)
+
+
 # Plot the intersection points between the aspect ratio line and the NFL lines
 def plot_intersection_points(ax, intersection_points):
     for ix, iy, nfl in intersection_points:
@@ -47,11 +86,10 @@ def plot_intersection_points(ax, intersection_points):
 # Load data from the specified JSON file
 def load_data(json_file_path, key):
     try:
-        with open(json_file_path, 'r') as file:
-            spec_data = json.load(file)
-            if key not in spec_data:
-                raise ValueError(f"Data not found for the given parameters: {key}")
-            return spec_data[key]
+        spec_data = chart_registry.read_json(json_file_path)
+        if key not in spec_data:
+            raise ValueError(f"Data not found for the given parameters: {key}")
+        return spec_data[key]
     except FileNotFoundError as fnf_error:
         print(f"File not found error: {fnf_error}")
         raise fnf_error
@@ -71,25 +109,55 @@ def group_points_by_nfl(data_list):
     return grouped_points
 
 
-# Plot the NFL curves for the given data
-def plot_nfl_curves(ax, grouped_points):
-    all_points = []
-    for nfl, points in grouped_points.items():
-        coords = np.array(points)
-        all_points.append(coords)
+# Compute the smooth curves of all NFL lines of a chart
+def compute_nfl_curves(grouped_points, n_points=100):
+    """
+    Compute the curve of every NFL line, evaluating the splines of all lines in one pass.
+
+    Lines with fewer than 4 points are kept as straight segments.
+
+    Returns:
+        list: (nfl, coords, curve_points) for every NFL line, in the order of grouped_points.
+    """
+    lines = [(nfl, np.array(points, dtype=float)) for nfl, points in grouped_points.items()]
+
+    segments = []
+    for _, coords in lines:
+        if len(coords) >= 4:
+            extended_coords = np.vstack([coords[0], coords[0], coords, coords[-1], coords[-1]])
+            count = len(extended_coords) - 3
+            segments.append(np.stack([extended_coords[j:j + count] for j in range(4)], axis=1))
+    splines = catmull_rom_splines(np.concatenate(segments), n_points) if segments else None
 
+    curves = []
+    start = 0
+    for nfl, coords in lines:
         if len(coords) < 4:
-            ax.plot(coords[:, 0], coords[:, 1], color='black')
-            ax.text(coords[0, 0], coords[0, 1], f'NFL={nfl}', fontsize=8, ha='right', color='black')
+            curves.append((nfl, coords, coords))
             continue
+        count = len(coords) + 1
+        curves.append((nfl, coords, splines[start:start + count].reshape(-1, 2)))
+        start += count
+    return curves
+
+
+def get_nfl_curves(layer_type, supported_sides, layer_thickness):
+    """
+    Retrieve the cached NFL line curves of a chart, recomputed whenever the chart file changes.
+    """
+    chart, json_file_path = load_nfl_chart(layer_type, supported_sides, layer_thickness)
+    return chart_registry.registry.derived(json_file_path, 'nfl_curves',
+                                           lambda _: compute_nfl_curves(chart.contours))
+
+
+# Plot the NFL curves for the given data
+def plot_nfl_curves(ax, grouped_points, curves=None):
+    if curves is None:
+        curves = compute_nfl_curves(grouped_points)
 
-        extended_coords = np.vstack([coords[0], coords[0], coords, coords[-1], coords[-1]])
-        curve_points = []
-        for i in range(1, len(extended_coords) - 2):
-            P0, P1, P2, P3 = extended_coords[i - 1], extended_coords[i], extended_coords[i + 1], extended_coords[i + 2]
-            segment = catmull_rom_spline(P0, P1, P2, P3, n_points=100)
-            curve_points.extend(segment)
-        curve_points = np.array(curve_points)
+    all_points = []
+    for nfl, coords, curve_points in curves:
+        all_points.append(coords)
         ax.plot(curve_points[:, 0], curve_points[:, 1], color='black')
         ax.text(curve_points[0, 0], curve_points[0, 1], f'NFL={nfl}', fontsize=8, ha='right', color='black')
     return all_points
@@ -99,7 +167,7 @@ def plot_top_diagonal_line(ax, grouped_points, extension_factor=10):
     # Identify the first NFL line
     first_nfl = sorted(grouped_points.keys())[-1]
     # Extract the first point from the first NFL line
-    if grouped_points[first_nfl]:
+    if len(grouped_points[first_nfl]):
         first_point = grouped_points[first_nfl][0]  # Get the first point
         # Calculate extended coordinates
         extended_x = first_point[0] * extension_factor
@@ -111,7 +179,7 @@ def plot_bottom_diagonal_line(ax, grouped_points, extension_factor=10):
     # Identify the first NFL line
     last_nfl = sorted(grouped_points.keys())[-1]
     # Extract the first point from the first NFL line
-    if grouped_points[last_nfl]:
+    if len(grouped_points[last_nfl]):
         first_point = grouped_points[last_nfl][-1]  # Get the first point
         # Calculate extended coordinates
         extended_x = first_point[0] * extension_factor
@@ -139,10 +207,10 @@ def set_grid(ax, max_x, max_y):
 
 
 # Draw an aspect ratio line on the plot
-def draw_aspect_ratio_line(length, width, extension_factor=1):
+def draw_aspect_ratio_line(ax, length, width, extension_factor=1):
     extended_length = length * extension_factor
     extended_width = width * extension_factor
-    plt.plot([0, extended_length], [0, extended_width], 'g--')
+    return ax.plot([0, extended_length], [0, extended_width], 'g--')
 
 
 # Find the closest points to the given length and width
@@ -154,6 +222,7 @@ def find_closest_points(length, width, data_list, n_points=4):
     if not points:
         return [], np.array([])
 
+    from scipy.spatial import cKDTree
     tree = cKDTree(points)
     distances, indices = tree.query([[length, width]], k=min(n_points, len(points)))
 
@@ -169,23 +238,16 @@ def plot_closest_points(ax, closest_coords):
 
 # Plot the target point on the graph
 def plot_target_point(ax, length, width):
-    ax.scatter([length], [width], color='black', s=10, zorder=5)
-    ax.axvline(x=length, color='red', linestyle='--', linewidth=1)
-    ax.axhline(y=width, color='red', linestyle='--', linewidth=1)
+    return [ax.scatter([length], [width], color='black', s=10, zorder=5),
+            ax.axvline(x=length, color='red', linestyle='--', linewidth=1),
+            ax.axhline(y=width, color='red', linestyle='--', linewidth=1)]
 
 
 # Perform inverse distance weighting to estimate the NFL value at a point
 def inverse_distance_weighting(x, y, points):
-    weights = []
-    epsilon = 1e-10
-    for point in points:
-        distance = np.sqrt((point['X'] - x) ** 2 + (point['Y'] - y) ** 2) + epsilon
-        if distance == 0:
-            return point['NFL']
-        weights.append(1 / distance)
-
-    weighted_nfl = sum(point['NFL'] * weight for point, weight in zip(points, weights)) / sum(weights)
-    return float(weighted_nfl)
+    coords = np.array([(point['X'], point['Y']) for point in points], dtype=float).reshape(-1, 2)
+    values = np.array([point['NFL'] for point in points], dtype=float)
+    return chart_index.inverse_distance_weighting(x, y, coords, values)
 
 
 # Find the NFL lines that enclose the calculated NFL value
@@ -206,17 +268,10 @@ def find_enclosing_nfl_lines(calculated_nfl, grouped_points):
 def find_intersection_points(length, width, grouped_points, lower_nfl, upper_nfl):
     intersection_points = []
     for nfl in [lower_nfl, upper_nfl]:
-        points = np.array(grouped_points[nfl])
-        for i in range(len(points) - 1):
-            p1 = points[i]
-            p2 = points[i + 1]
-            if (p1[1] - p1[0] * width / length) * (p2[1] - p2[0] * width / length) <= 0:
-                t = (p1[1] - p1[0] * width / length) / (
-                        (p1[1] - p1[0] * width / length) - (p2[1] - p2[0] * width / length))
-                intersection_x = p1[0] + t * (p2[0] - p1[0])
-                intersection_y = p1[1] + t * (p2[1] - p1[1])
-                intersection_points.append((intersection_x, intersection_y, nfl))
-                break
+        points = np.array(grouped_points[nfl], dtype=float).reshape(-1, 2)
+        intersection_x, intersection_y = chart_index.aspect_ratio_intersections(length, width, points)
+        if not np.isnan(intersection_x):
+            intersection_points.append((intersection_x, intersection_y, nfl))
     return intersection_points
 
 
@@ -241,63 +296,154 @@ def find_and_weight_closest_points_from_nfl_lines(length, width, grouped_points,
     return weighted_nfl
 
 
-# Main function to plot NFL from JSON data
-def plot_nfl_from_json(length, width, supported_sides, layer_thickness, save_path, calculated_nfl, layer_type, index):
-    weighted_nfl_from_nfl_lines = []
-    plot_image_paths = []
-    key = f"NFL{layer_thickness}mm{supported_sides}S"
-    json_file_path = os.path.join('.', 'Json', 'NFL', f'{layer_type}', f'{supported_sides}Sided', f"{key}.json")
+# Load the typed chart and its file path
+def load_nfl_chart(layer_type, supported_sides, layer_thickness):
+    chart = chart_registry.get_nfl_chart(layer_type, supported_sides, layer_thickness)
+    if chart is None:
+        raise ValueError(f"Data not found for the given parameters: NFL{layer_thickness}mm{supported_sides}S")
+    _, json_file_path = chart_registry.nfl_chart_path(layer_type, supported_sides, layer_thickness)
+    return chart, json_file_path
 
-    if width > length:
-        width, length = length, width
 
-    data_list = load_data(json_file_path, key)
-    grouped_points = group_points_by_nfl(data_list)
+# Load the spatial index of a chart
+def load_chart_index(layer_type, supported_sides, layer_thickness):
+    index = chart_index.get_chart_index(layer_type, supported_sides, layer_thickness)
+    if index is None:
+        raise ValueError(f"Data not found for the given parameters: NFL{layer_thickness}mm{supported_sides}S")
+    return index
 
-    fig, ax = plt.subplots()
-    all_points = plot_nfl_curves(ax, grouped_points)
-    # max_x = max(all_points, key=lambda p: p[:, 0].max())[0].max()
-    # max_y = max(all_points, key=lambda p: p[:, 1].max())[1].max()
-    # Combine all points to determine the plotting range
-    all_points = np.vstack(all_points)
-    max_x = all_points[:, 0].max()
-    max_y = all_points[:, 1].max()
 
-    plot_top_diagonal_line(ax, grouped_points)
-    plot_bottom_diagonal_line(ax, grouped_points)
-    set_grid(ax, max_x, max_y)
-    draw_aspect_ratio_line(length, width)
+# Estimate the NFL from the two NFL lines enclosing the calculated NFL value
+def estimate_nfl_from_nfl_lines(length, width, supported_sides, layer_thickness, calculated_nfl, layer_type):
+    index = load_chart_index(layer_type, supported_sides, layer_thickness)
 
     n_points = 3
     n_points += 1
-    closest_points, closest_coords = find_closest_points(length, width, data_list, n_points)
-    # plot_closest_points(ax, closest_coords)
-    plot_target_point(ax, length, width)
+    return round(index.estimate_nfl(length, width, calculated_nfl, n_points), 2)
 
-    lower_nfl, upper_nfl = find_enclosing_nfl_lines(calculated_nfl[index], grouped_points)
-    # intersection_points = find_intersection_points(length, width, grouped_points, lower_nfl, upper_nfl)
-    # plot_intersection_points(ax, intersection_points)
+
+# Estimate the NFL from the NFL lines for a whole schedule of panels of the same build-up
+def estimate_nfl_from_nfl_lines_batch(lengths, widths, supported_sides, layer_thickness, calculated_nfls,
+                                      layer_type):
+    """
+    Vectorized estimate_nfl_from_nfl_lines.
+
+    Returns:
+        np.ndarray: The estimated NFL of every panel, rounded to 2 decimals, NaN where the calculated
+                    NFL is not enclosed by two NFL lines.
+    """
+    index = load_chart_index(layer_type, supported_sides, layer_thickness)
 
     n_points = 3
     n_points += 1
-    weighted_nfl_from_nfl_lines.append(find_and_weight_closest_points_from_nfl_lines(length, width, grouped_points,
-                                                                                     lower_nfl, upper_nfl, n_points,
-                                                                                     ax=ax))
-
-    ax.set_title(f'NFL for {layer_thickness} mm with {supported_sides} sided support', pad=20)
-    ax.set_xlabel("X")
-    ax.set_ylabel("Y")
-    ax.legend()
-    current_plot_path = f"{save_path}_plot_{index + 1}.png"
-    plt.savefig(current_plot_path)
-    plt.close()
-
-    plot_image_paths.append(current_plot_path)
-    # print(f"math NFL = {calculated_nfl[index]}")
-    # print("4 points NFL2 = ", weighted_nfl_from_nfl_lines)
-    # print("weighted_nfl_from_nfl_lines", weighted_nfl_from_nfl_lines)
-
-    # for i in range(len(weighted_nfl_from_nfl_lines)):
-    #     weighted_nfl_from_nfl_lines[i] = round(weighted_nfl_from_nfl_lines[i], 2)
-
-    return round(weighted_nfl_from_nfl_lines[0], 2), plot_image_paths
+    return np.round(index.estimate_nfl_batch(lengths, widths, calculated_nfls, n_points), 2)
+
+
+class PlotTemplate:
+    """
+    The static part of an NFL chart (contours, diagonals, grid and labels), rendered once.
+
+    The rendered background is kept as an Agg raster; render() restores it and only draws the
+    aspect ratio line and the target point of a request on top of it.
+    """
+
+    def __init__(self, grouped_points, layer_thickness, supported_sides, curves=None):
+        # matplotlib is only imported once a plot is actually drawn
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        self.figure = Figure()
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.subplots()
+
+        all_points = np.vstack(plot_nfl_curves(self.ax, grouped_points, curves))
+        max_x = all_points[:, 0].max()
+        max_y = all_points[:, 1].max()
+
+        plot_top_diagonal_line(self.ax, grouped_points)
+        plot_bottom_diagonal_line(self.ax, grouped_points)
+        set_grid(self.ax, max_x, max_y)
+
+        self.ax.set_title(f'NFL for {layer_thickness} mm with {supported_sides} sided support', pad=20)
+        self.ax.set_xlabel("X")
+        self.ax.set_ylabel("Y")
+
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        # The canvas is shared by every request for this chart
+        self._lock = threading.Lock()
+
+    def render(self, length, width):
+        """
+        Draw the overlay of one panel over the background.
+
+        Returns:
+            bytes: The PNG image.
+        """
+        with self._lock:
+            self.canvas.restore_region(self.background)
+            artists = draw_aspect_ratio_line(self.ax, length, width) + plot_target_point(self.ax, length, width)
+            for artist in sorted(artists, key=lambda a: a.get_zorder()):
+                self.ax.draw_artist(artist)
+                artist.remove()
+            image = np.array(self.canvas.buffer_rgba())
+
+        from matplotlib.image import imsave
+        plot_bytes = io.BytesIO()
+        imsave(plot_bytes, image, format='png')
+        return plot_bytes.getvalue()
+
+
+def get_plot_template(layer_type, supported_sides, layer_thickness):
+    """
+    Retrieve the cached plot template of an NFL chart, rebuilt whenever the chart file changes.
+    """
+    chart, json_file_path = load_nfl_chart(layer_type, supported_sides, layer_thickness)
+    return chart_registry.registry.derived(
+        json_file_path, 'plot_template',
+        lambda _: PlotTemplate(chart.contours, layer_thickness, supported_sides,
+                               get_nfl_curves(layer_type, supported_sides, layer_thickness)))
+
+
+def build_plot_templates(supported_sides=(4,)):
+    """
+    Render the plot template and build the index of every NFL chart ahead of the first request.
+
+    Args:
+        supported_sides (tuple): The supports to prepare, plots are only drawn for 4-sided panels.
+
+    Returns:
+        int: The number of charts prepared.
+    """
+    count = 0
+    for json_file_path, chart in chart_registry.iter_nfl_charts():
+        # ./Json/NFL/<layer_type>/<n>Sided/NFL<thickness>mm<n>S.json
+        layer_type = os.path.basename(os.path.dirname(os.path.dirname(json_file_path)))
+        match = re.fullmatch(r'NFL(.+)mm(\d+)S', chart.key)
+        if match is None or int(match.group(2)) not in supported_sides:
+            continue
+
+        layer_thickness, sides = match.group(1), int(match.group(2))
+        get_plot_template(layer_type, sides, layer_thickness)
+        load_chart_index(layer_type, sides, layer_thickness)
+        count += 1
+    return count
+
+
+# Main function to plot NFL from JSON data
+def plot_nfl_from_json(length, width, supported_sides, layer_thickness, plot_name, calculated_nfl, layer_type, index):
+    nfl_chart_index = load_chart_index(layer_type, supported_sides, layer_thickness)
+
+    if width > length:
+        width, length = length, width
+
+    n_points = 3
+    n_points += 1
+    weighted_nfl_from_nfl_lines = nfl_chart_index.estimate_nfl(length, width, calculated_nfl[index], n_points)
+
+    # Only the aspect ratio line and the target point are drawn per request
+    template = get_plot_template(layer_type, supported_sides, layer_thickness)
+    current_plot_name = f"{plot_name}_plot_{index + 1}.png"
+    plot_images = [(current_plot_name, template.render(length, width))]
+
+    return round(weighted_nfl_from_nfl_lines, 2), plot_images
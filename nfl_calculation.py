@@ -1,36 +1,147 @@
-import os
-import json
+from functools import cached_property
 import numpy as np
-from scipy.interpolate import griddata
+import chart_registry
+
+# scipy is imported where it is first used: it is the slowest import of the app and the
+# 1- and 2-sided calculations and command line tools never need it
+
+
+class NFLInterpolators:
+    """
+    Interpolators over the points of one NFL chart.
+
+    They give the same results as scipy.interpolate.griddata with the matching method, but the
+    triangulation and the Clough-Tocher gradients are computed once per chart instead of once per call.
+    Each interpolator is built on first use; the cubic and linear ones share the triangulation.
+    """
+
+    def __init__(self, points, values):
+        self.points = points
+        self.values = values
+
+    @cached_property
+    def triangulation(self):
+        from scipy.spatial import Delaunay
+        return Delaunay(self.points)
+
+    @cached_property
+    def cubic(self):
+        from scipy.interpolate import CloughTocher2DInterpolator
+        return CloughTocher2DInterpolator(self.triangulation, self.values)
+
+    @cached_property
+    def linear(self):
+        from scipy.interpolate import LinearNDInterpolator
+        return LinearNDInterpolator(self.triangulation, self.values)
+
+    @cached_property
+    def nearest(self):
+        from scipy.interpolate import NearestNDInterpolator
+        return NearestNDInterpolator(self.points, self.values)
+
+    def get(self, method):
+        if method not in ('cubic', 'linear', 'nearest'):
+            raise ValueError(f"Unknown interpolation method: {method}")
+        return getattr(self, method)
+
+
+def _chart_interpolators(json_file_path, chart):
+    return chart_registry.registry.derived(json_file_path, 'interpolators',
+                                           lambda _: NFLInterpolators(chart.points, chart.nfl))
+
+
+def get_nfl_interpolators(layer_type, supported_sides, layer_thickness):
+    """
+    Retrieve the cached interpolators of an NFL chart, keyed by (layer_type, supported_sides, layer_thickness).
+
+    Returns:
+        NFLInterpolators or None: The interpolators, or None if the chart file does not hold the expected key.
+    """
+    chart = chart_registry.get_nfl_chart(layer_type, supported_sides, layer_thickness)
+    if chart is None:
+        return None
+    _, json_file_path = chart_registry.nfl_chart_path(layer_type, supported_sides, layer_thickness)
+    return _chart_interpolators(json_file_path, chart)
+
+
+def build_interpolators(methods=('cubic',)):
+    """
+    Build the interpolators of every NFL chart ahead of the first request.
+
+    Returns:
+        int: The number of charts prepared.
+    """
+    count = 0
+    for json_file_path, chart in chart_registry.iter_nfl_charts():
+        interpolators = _chart_interpolators(json_file_path, chart)
+        for method in methods:
+            interpolators.get(method)
+        count += 1
+    return count
+
+
+class NFLResult:
+    """
+    Result of calculate_nfl.
+
+    The NFL value and the chart data are available right away. The 100x100 surface over the chart
+    (xi, yi, zi) is only interpolated the first time one of those attributes is read.
+    """
+
+    def __init__(self, nfl, json_x, json_y, json_nfl, length, width, ar, key, interpolators, surface_method):
+        self.nfl = nfl
+        self.json_x = json_x
+        self.json_y = json_y
+        self.json_nfl = json_nfl
+        self.length = length
+        self.width = width
+        self.ar = ar
+        self.key = key
+        self._interpolators = interpolators
+        self._surface_method = surface_method
+
+    @cached_property
+    def surface(self):
+        return interpolate_nfl_surface(self.json_x, self.json_y, self._interpolators, self._surface_method)
+
+    @property
+    def xi(self):
+        return self.surface[0]
+
+    @property
+    def yi(self):
+        return self.surface[1]
+
+    @property
+    def zi(self):
+        return self.surface[2]
 
 
 def calculate_nfl(length, width, supported_sides, layer_thickness, layer_types):
     for layer_type in layer_types:
         key = f"NFL{layer_thickness}mm{supported_sides}S"
-        json_file_path = os.path.join('.', 'Json', 'NFL', f'{layer_type}', f'{supported_sides}Sided', f"{key}.json")
 
         try:
-            with open(json_file_path, 'r') as file:
-                spec_data = json.load(file)
-                if key in spec_data:
-                    data_list = spec_data[key]
-                    jsonNFL = np.array([item['NFL'] for item in data_list])
-                    jsonX = np.array([item['X'] for item in data_list])
-                    jsonY = np.array([item['Y'] for item in data_list])
+            chart = chart_registry.get_nfl_chart(layer_type, supported_sides, layer_thickness)
+            if chart is not None:
+                interpolators = get_nfl_interpolators(layer_type, supported_sides, layer_thickness)
 
-                    AR = length / width  # Calculate AR
-                    NFL_interpolated, xi, yi, zi = interpolate_nfl_griddata(length, width, AR, jsonX, jsonY, jsonNFL)
+                AR = length / width  # Calculate AR
+                NFL_interpolated, surface_method = interpolate_nfl_griddata(length, width, AR, chart.x, chart.y,
+                                                                            chart.nfl, interpolators)
 
-                    if np.isnan(NFL_interpolated):
-                        return 0, jsonX, jsonY, jsonNFL, length, width, xi, yi, zi, AR, key
+                if np.isnan(NFL_interpolated):
+                    NFL_interpolated = 0
 
-                    return NFL_interpolated, jsonX, jsonY, jsonNFL, length, width, xi, yi, zi, AR, key
-                else:
-                    return {"error": "Data not found for the given parameters"}, 404
+                return NFLResult(NFL_interpolated, chart.x, chart.y, chart.nfl, length, width, AR, key,
+                                 interpolators, surface_method)
+            else:
+                return {"error": "Data not found for the given parameters"}, 404
 
         except FileNotFoundError as fnf_error:
             print(f"File not found error: {fnf_error}")
-            return {"error": str(fnf_error)}, 404
+            # The message names a server path, the client only learns that there is no chart
+            return {"error": "Data not found for the given parameters"}, 404
         except (ValueError, KeyError) as e:
             print(f"Value error: {e}")
             return {"error": str(e)}, 400
@@ -39,26 +150,66 @@ def calculate_nfl(length, width, supported_sides, layer_thickness, layer_types):
             return {"error": str(e)}, 500
 
 
-def interpolate_nfl_griddata(length, width, ar, json_x, json_y, json_nfl):
+def calculate_nfl_batch(lengths, widths, supported_sides, layer_thickness, layer_type):
+    """
+    Calculate the NFL of many panels of the same build-up with a single interpolator call.
+
+    The panel sizes are put on the chart the same way as in interpolate_nfl_griddata: the long side
+    is used as length, and square panels are moved 10 mm off the diagonal.
+
+    Args:
+        lengths (array-like): Glass lengths in mm.
+        widths (array-like): Glass widths in mm, broadcastable against lengths.
+        supported_sides (int): Number of supported sides.
+        layer_thickness (float): Nominal glass thickness in mm.
+        layer_type (str): Either "mono" or "laminated".
+
+    Returns:
+        np.ndarray: The NFL of every panel, 0 where the panel lies outside the chart.
+    """
+    interpolators = get_nfl_interpolators(layer_type, supported_sides, layer_thickness)
+    if interpolators is None:
+        raise ValueError(f"Data not found for the given parameters: NFL{layer_thickness}mm{supported_sides}S")
+
+    lengths, widths = np.broadcast_arrays(np.asarray(lengths, dtype=float), np.asarray(widths, dtype=float))
+    long_sides = np.maximum(lengths, widths)
+    short_sides = np.minimum(lengths, widths)
+    long_sides = np.where(long_sides == short_sides, long_sides + 10, long_sides)
+
+    nfl = interpolators.cubic(long_sides, short_sides)
+    return np.nan_to_num(nfl, nan=0.0)
+
+
+def interpolate_nfl_griddata(length, width, ar, json_x, json_y, json_nfl, interpolators=None):
+    """
+    Interpolate the NFL at a single panel size.
+
+    Returns:
+        tuple: The interpolated NFL and the interpolation method to use for the surface over the chart.
+    """
+    if interpolators is None:
+        interpolators = NFLInterpolators(np.column_stack((json_x, json_y)), json_nfl)
+
     if length < width:
         length, width = width, length
     #
     if length == width:
         length += 10
-        points = np.array(list(zip(json_x, json_y)))
-        NFL_interpolated = griddata(points, json_nfl, (length, width), method='cubic')
-        xi = np.linspace(min(json_x), max(json_x), 100)
-        yi = np.linspace(min(json_y), max(json_y), 100)
-        xi, yi = np.meshgrid(xi, yi)
-        zi = griddata(points, json_nfl, (xi, yi), method='nearest')
-
-        return NFL_interpolated, xi, yi, zi
+        return interpolators.cubic(length, width), 'nearest'
     else:
-        points = np.array(list(zip(json_x, json_y)))
-        NFL_interpolated = griddata(points, json_nfl, (length, width), method='cubic')
-        xi = np.linspace(min(json_x), max(json_x), 100)
-        yi = np.linspace(min(json_y), max(json_y), 100)
-        xi, yi = np.meshgrid(xi, yi)
-        zi = griddata(points, json_nfl, (xi, yi), method='cubic')
-
-        return NFL_interpolated, xi, yi, zi
+        return interpolators.cubic(length, width), 'cubic'
+
+
+def interpolate_nfl_surface(json_x, json_y, interpolators, method):
+    """
+    Interpolate the NFL over a 100x100 grid spanning the chart.
+
+    Returns:
+        tuple: The xi, yi meshgrid and the interpolated zi values.
+    """
+    xi = np.linspace(min(json_x), max(json_x), 100)
+    yi = np.linspace(min(json_y), max(json_y), 100)
+    xi, yi = np.meshgrid(xi, yi)
+    zi = interpolators.get(method)(xi, yi)
+
+    return xi, yi, zi
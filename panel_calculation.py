@@ -0,0 +1,250 @@
+from nfl_calculation import calculate_nfl, NFLResult
+from get_gtf import get_gtf_value
+from lr_calculation import calculate_lr
+from cof_calculation import calculate_cof
+from newPlotting import plot_nfl_from_json, estimate_nfl_from_nfl_lines
+from glass_weight import calculate_glass_weight
+from get_load_share_factor import get_load_share_factor
+from NFL_COF_1and2Sided import find_load_for_given_length
+from cof_recommendation import find_correct_thickness
+import timing
+
+MODULUS_OF_ELASTICITY = 71700000
+
+
+class CalculationError(Exception):
+    """
+    Raised when a panel cannot be calculated.
+
+    Attributes:
+        payload: The JSON body returned to the client (usually a message string).
+        status (int): The HTTP status code returned to the client.
+    """
+
+    def __init__(self, payload, status=400):
+        super().__init__(payload)
+        self.payload = payload
+        self.status = status
+
+
+def calculate_panel(input_data, include_plots=False):
+    """
+    Run the NFL, COF, GTF, LSF, LR, weight and thickness recommendation calculations for one panel.
+
+    Args:
+        input_data (dict): The panel specification, as sent in the 'data' field of /calculate.
+        include_plots (bool): Draw the NFL plots of a 4-sided panel, returned as (filename, PNG bytes)
+                              pairs under 'plots'.
+
+    Returns:
+        dict: The calculated values, see the keys at the end of the function.
+
+    Raises:
+        CalculationError: With the message to return to the client when the input cannot be calculated.
+    """
+    modulus_of_elasticity = MODULUS_OF_ELASTICITY
+    shortDurationLoad = input_data.get('shortDurationLoad', 0)
+    longDurationLoad = input_data.get('longDurationLoad', 0)
+    allowable_Deflection = input_data.get('allowable_Deflection', 0)
+    glass_length = input_data.get('glassLength', 0)
+    glass_width = input_data.get('glassWidth', 0)
+    number_of_supported_sides = input_data.get('numberOfSupportedSides', 0)
+    glazing_type = input_data.get('glazingType', 0)
+    layers_types = input_data.get('layersTypes', [])
+    layers_thicknesses = input_data.get('layersThicknesses', [])
+    glass_layers_strength_type = input_data.get('glassLayersStrengthType', [])
+    pvb_thicknesses = input_data.get('pvbThicknesses', [])
+    interlayerTypes = input_data.get('interlayerTypes', [])
+
+    # A 4-sided panel is calculated with its long side as length, whichever way round it was entered
+    if number_of_supported_sides == 4 and glass_width > glass_length:
+        glass_length, glass_width = glass_width, glass_length
+
+    nfl_result = []
+    with timing.span('gtf'):
+        gtf = get_gtf_value(glass_layers_strength_type, glazing_type)
+    short_cof_to_send = []
+    long_cof_to_send = []
+    lr = []
+    lr_value = 0
+    recommended_thickness = {'Short': [], 'Long': []}
+    plot_interpolated_nfl = []
+    plots = []
+    layer_type = None
+
+    # Perform NFL calculation for each layer's thickness
+    if number_of_supported_sides == 4:
+        for thickness in layers_thicknesses:
+            try:
+                with timing.span('nfl'):
+                    result = calculate_nfl(glass_length, glass_width, number_of_supported_sides, thickness,
+                                           layers_types)
+            except:
+                raise CalculationError("Adjust your input data")
+
+            if isinstance(result, NFLResult):
+                nfl_result.append(round(float(result.nfl), 2))  # Convert to float
+            else:
+                raise CalculationError(*result)
+
+            try:
+                with timing.span('cof'):
+                    cof_short_duration = round(
+                        float(calculate_cof(shortDurationLoad, glass_length, glass_width, modulus_of_elasticity,
+                                            thickness, interlayerTypes)), 2)
+                    short_cof_to_send.append(cof_short_duration)
+
+                    if longDurationLoad != 0:
+                        cof_long_duration = round(
+                            float(calculate_cof(longDurationLoad, glass_length, glass_width, modulus_of_elasticity,
+                                                thickness, interlayerTypes)), 2)
+                        long_cof_to_send.append(cof_long_duration)
+            except ValueError:
+                raise CalculationError("Adjust the width or the length of the glass")
+            except TypeError:
+                raise CalculationError("Adjust the widt or the length of the glass")
+
+        try:
+            for index, (layers_thickness, layer_type) in enumerate(zip(layers_thicknesses, layers_types)):
+                if not include_plots:
+                    with timing.span('nfl_lines'):
+                        interpolated_nfl = estimate_nfl_from_nfl_lines(glass_length, glass_width,
+                                                                       number_of_supported_sides, layers_thickness,
+                                                                       nfl_result[index], layer_type)
+                else:
+                    with timing.span('plot'):
+                        interpolated_nfl, layer_plots = plot_nfl_from_json(
+                            glass_length, glass_width, number_of_supported_sides,
+                            layers_thickness, f"nfl_plot_{layers_thickness}",
+                            nfl_result, layer_type, index  # Pass the index along with other parameters
+                        )
+                    plots.extend(layer_plots)
+                plot_interpolated_nfl.append(interpolated_nfl)
+        except Exception:
+            raise CalculationError("Adjust your input data")
+
+    else:
+        try:
+            for thickness, layer_type in zip(layers_thicknesses, layers_types):
+                with timing.span('nfl'):
+                    nfl_result.append(find_load_for_given_length(thickness, glass_length, layer_type,
+                                                                 number_of_supported_sides, "NFL", 0,
+                                                                 interlayerTypes))
+
+                with timing.span('cof'):
+                    cof_short_duration = find_load_for_given_length(thickness, glass_length, layer_type,
+                                                                    number_of_supported_sides, "COF",
+                                                                    shortDurationLoad, interlayerTypes)
+                    short_cof_to_send.append(cof_short_duration)
+
+                    if longDurationLoad != 0:
+                        cof_long_duration = find_load_for_given_length(thickness, glass_length, layer_type,
+                                                                       number_of_supported_sides, "COF",
+                                                                       longDurationLoad, interlayerTypes)
+                        long_cof_to_send.append(cof_long_duration)
+        except:
+            raise CalculationError("Adjust your input data")
+
+    # The 4-sided LR uses the NFL read back from the NFL lines
+    lr_nfl = plot_interpolated_nfl if number_of_supported_sides == 4 else nfl_result
+
+    # Load share factor (LSF) and LR calculations
+    if glazing_type == "double":
+        try:
+            with timing.span('lsf'):
+                lsf_value = get_load_share_factor(layers_thicknesses, layers_types)
+        except:
+            raise CalculationError("Adjust your input data")
+
+        try:
+            with timing.span('lr'):
+                lr_value = calculate_lr(lr_nfl, gtf, lsf_value, glazing_type)
+            lr.append(lr_value)
+        except:
+            raise CalculationError("Adjust your input data")
+
+    else:
+        lsf_value = None  # or a more meaningful default value, if None isn't appropriate
+        try:
+            for nfl_value in lr_nfl:
+                with timing.span('lr'):
+                    lr_value = calculate_lr(nfl_value, gtf, lsf_value, "single")
+        except:
+            raise CalculationError("Adjust your input data")
+        lr.append(lr_value)
+
+    # Calculate glass weight including PVB layers
+    try:
+        with timing.span('glass_weight'):
+            glass_weight = calculate_glass_weight(
+                glass_length, glass_width, layers_thicknesses, layers_types, pvb_thicknesses=pvb_thicknesses
+            )
+    except:
+        raise CalculationError("Adjust your input data")
+
+    if not short_cof_to_send:
+        raise CalculationError("Adjust your input data")
+
+    if short_cof_to_send[0] > float(allowable_Deflection) or (len(long_cof_to_send) > 0 and long_cof_to_send[0] >
+                                                              float(allowable_Deflection)):
+        with timing.span('recommendation'):
+            recommended_thickness = find_correct_thickness(shortDurationLoad, longDurationLoad,
+                                                           allowable_Deflection, number_of_supported_sides,
+                                                           glass_length, glass_width, modulus_of_elasticity,
+                                                           interlayerTypes, layer_type)
+
+    return {
+        'nfl': nfl_result,
+        'nfl_from_nfl_lines': plot_interpolated_nfl,
+        'gtf': gtf,
+        'lsf': lsf_value,
+        'lr': lr,
+        'short_cof': short_cof_to_send,
+        'long_cof': long_cof_to_send,
+        'glass_weight': glass_weight,
+        'recommended_thickness': recommended_thickness,
+        'plots': plots,
+    }
+
+
+def render_plots(input_data, results):
+    """
+    Draw the NFL plots of a 4-sided panel calculated by calculate_panel.
+
+    Returns:
+        list: (filename, PNG bytes) pairs, empty for 1- and 2-sided panels.
+    """
+    plots = []
+    if input_data.get('numberOfSupportedSides', 0) != 4:
+        return plots
+
+    layers_thicknesses = input_data.get('layersThicknesses', [])
+    layers_types = input_data.get('layersTypes', [])
+    for index, (layers_thickness, layer_type) in enumerate(zip(layers_thicknesses, layers_types)):
+        with timing.span('plot'):
+            _, layer_plots = plot_nfl_from_json(
+                input_data.get('glassLength', 0), input_data.get('glassWidth', 0), 4,
+                layers_thickness, f"nfl_plot_{layers_thickness}",
+                results['nfl'], layer_type, index
+            )
+        plots.extend(layer_plots)
+    return plots
+
+
+def render_report(fileobj, input_data, plyThicknessList, results, logo_path, first_page_image_path):
+    """
+    Write the PDF report of a panel calculated by calculate_panel to fileobj.
+    """
+    # reportlab is only imported when a report is rendered
+    from pdf_creation import create_pdf
+
+    with timing.span('pdf'):
+        create_pdf(fileobj, input_data.get('glassLength', 0), input_data.get('glassWidth', 0),
+                   input_data.get('pvbThicknesses', []), input_data.get('numberOfSupportedSides', 0),
+                   input_data.get('layersThicknesses', []), plyThicknessList, results['glass_weight'],
+                   input_data.get('shortDurationLoad', 0), input_data.get('longDurationLoad', 0),
+                   input_data.get('allowable_Deflection', 0), results['lr'], input_data.get('glazingType', 0),
+                   results['short_cof'], results['long_cof'], input_data.get('layersTypes', []),
+                   input_data.get('interlayerTypes', []), results['recommended_thickness'],
+                   input_data.get('airGap', 0), input_data.get('glassLayersStrengthType', []), logo_path,
+                   first_page_image_path)
@@ -1,7 +1,10 @@
+import io
+from functools import lru_cache
 from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
 from reportlab.lib.colors import HexColor, black, white
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_LEFT, TA_CENTER
 
@@ -24,6 +27,23 @@ styles.add(
 styles.add(ParagraphStyle(name='MySection', fontName='Helvetica-Bold', fontSize=10, textColor=black, spaceAfter=8))
 
 
+@lru_cache(maxsize=None)
+def load_image(image_path):
+    """
+    Read an image file once and keep its bytes in memory, so reports do not read it from disk again.
+    The returned bytes can be passed wherever create_pdf expects an image path.
+    """
+    with open(image_path, 'rb') as f:
+        return f.read()
+
+
+def image_reader(image):
+    # A reader holds a file position, so every report gets its own over the shared bytes
+    if isinstance(image, bytes):
+        return ImageReader(io.BytesIO(image))
+    return image
+
+
 def draw_section_title(text):
     # Create a table with red background and white bold text
     title_data = [[text]]
@@ -46,9 +66,9 @@ def draw_paragraph(text, style):
 
 
 def add_logo_and_text(canvas, doc, logo_path):
-    # Add logo at the top-right corner
-    logo = Image(logo_path, width=70, height=70)
-    logo.drawOn(canvas, doc.pagesize[0] - 130, doc.pagesize[1] - 80)  # Positioning the logo
+    # Add logo at the top-right corner (logo_path can also be an ImageReader)
+    canvas.drawImage(logo_path, doc.pagesize[0] - 130, doc.pagesize[1] - 80, width=70, height=70,
+                     mask='auto')  # Positioning the logo
 
     # Set the font for the footer
     canvas.setFont('Helvetica', 10)
@@ -190,6 +210,8 @@ def create_pdf(fileobj, glass_length, glass_width, pvb_thicknesses, number_of_su
                logo_path, first_page_image_path):
     if glass_width > glass_length:
         glass_length, glass_width = glass_width, glass_length
+    logo_path = image_reader(logo_path)
+    first_page_image_path = image_reader(first_page_image_path)
     doc = SimpleDocTemplate(fileobj, pagesize=A4, topMargin=30)
     elements = [
         draw_paragraph("COMPANY'S NAME", styles['MainTitle']),
@@ -0,0 +1,153 @@
+import os
+import sys
+import hmac
+import time
+import random
+import functools
+import threading
+from collections import Counter
+
+# Token of the admin endpoint serving the profiles; the profiler is off when it is not set
+PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN', '')
+# Fraction of the requests (and reports) whose call stacks are sampled
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.1))
+# Seconds between two samples of a profiled thread
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.005))
+
+MAX_DEPTH = 128
+# Distinct stacks kept; samples of new stacks beyond this are counted under a single entry
+MAX_STACKS = 20000
+
+ENABLED = bool(PROFILER_TOKEN)
+
+
+class StackSampler:
+    """
+    Samples the call stacks of registered threads from a background thread.
+
+    Stacks are aggregated in memory in the collapsed format used by flamegraph tools:
+    one line per distinct stack, frames from the root separated by ';', followed by the sample count.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._threads = {}  # thread id -> tag
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self, tag):
+        """
+        Start sampling the current thread, its stacks are prefixed with tag.
+
+        Returns:
+            int: The thread id, passed to stop().
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._threads[thread_id] = tag
+            # Threads do not survive fork(), every worker process starts its own
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+        return thread_id
+
+    def stop(self, thread_id):
+        with self._lock:
+            self._threads.pop(thread_id, None)
+
+    def collapsed(self, reset=False):
+        """
+        Return the aggregated stacks in the collapsed format.
+        """
+        with self._lock:
+            lines = [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+            if reset:
+                self.stacks.clear()
+                self.samples = 0
+        return '\n'.join(lines) + ('\n' if lines else '')
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.interval)
+            with self._lock:
+                threads = dict(self._threads)
+            if not threads:
+                continue
+
+            frames = sys._current_frames()
+            collected = []
+            for thread_id, tag in threads.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    collected.append(_collapse(tag, frame))
+
+            with self._lock:
+                for stack in collected:
+                    if stack not in self.stacks and len(self.stacks) >= MAX_STACKS:
+                        stack = 'truncated'
+                    self.stacks[stack] += 1
+                    self.samples += 1
+
+
+def _collapse(tag, frame):
+    frames = []
+    while frame is not None and len(frames) < MAX_DEPTH:
+        code = frame.f_code
+        frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    frames.append(tag)
+    return ';'.join(reversed(frames))
+
+
+sampler = StackSampler()
+
+
+def should_sample():
+    return ENABLED and random.random() < PROFILE_SAMPLE_RATE
+
+
+def start(tag):
+    """
+    Sample the current thread if the profiler is on and this call is picked by PROFILE_SAMPLE_RATE.
+
+    Returns:
+        int or None: The token to pass to stop(), None when the thread is not sampled.
+    """
+    if not should_sample():
+        return None
+    return sampler.start(tag)
+
+
+def stop(token):
+    if token is not None:
+        sampler.stop(token)
+
+
+def profiled(function, tag):
+    """
+    Wrap a function (e.g. a background report job) so its calls are sampled like requests.
+    """
+    if not ENABLED:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        token = start(tag)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stop(token)
+
+    return wrapper
+
+
+def check_token(token):
+    """
+    Check the token sent to the admin endpoint against PROFILER_TOKEN.
+    """
+    return ENABLED and hmac.compare_digest(token.encode('utf-8'), PROFILER_TOKEN.encode('utf-8'))
@@ -0,0 +1,84 @@
+import os
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of threads rendering reports in each process
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+# Number of finished jobs remembered per process, the oldest are forgotten first. Jobs are only known to
+# the process that submitted them, which is why gunicorn.conf.py runs a single worker
+MAX_JOBS = int(os.environ.get('REPORT_MAX_JOBS', 1000))
+
+_executor = None
+_jobs = OrderedDict()
+_lock = threading.Lock()
+
+
+class ReportJob:
+    """
+    A report rendered in the background.
+
+    Attributes:
+        job_id (str): The id used in /report/<job_id>.
+        future (concurrent.futures.Future): Resolves to whatever the render function returned.
+    """
+
+    def __init__(self, job_id, future):
+        self.job_id = job_id
+        self.future = future
+
+    @property
+    def status(self):
+        if not self.future.done():
+            return 'running' if self.future.running() else 'pending'
+        return 'failed' if self.future.exception() is not None else 'done'
+
+    def result(self):
+        return self.future.result()
+
+
+def _get_executor():
+    # Created on first use so every (forked) worker process starts its own threads
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix='report')
+    return _executor
+
+
+def submit(render, *args, **kwargs):
+    """
+    Queue render(*args, **kwargs) on the report worker pool.
+
+    Returns:
+        ReportJob: The queued job.
+    """
+    job_id = uuid.uuid4().hex
+    with _lock:
+        job = ReportJob(job_id, _get_executor().submit(render, *args, **kwargs))
+        _jobs[job_id] = job
+        while len(_jobs) > MAX_JOBS:
+            _jobs.popitem(last=False)
+    return job
+
+
+def get(job_id):
+    """
+    Retrieve a job by id.
+
+    Returns:
+        ReportJob or None: The job, or None if it is unknown or was forgotten.
+    """
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def shutdown(wait=True):
+    """
+    Stop the worker pool; a new one is started by the next submit().
+    """
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Number of calculations remembered per process
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 128))
+# Seconds a calculation is remembered, 0 keeps it until it is evicted
+RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 0))
+
+
+def canonical_key(input_data, plyThicknessList=()):
+    """
+    Hash a calculation request so that equivalent requests get the same key.
+
+    Dictionary key order does not matter. Values are kept as sent (6 and 6.0 select different chart
+    files), and so are the order of the layer lists and the orientation of the panel, since the
+    cached report shows the dimensions the way round they were entered.
+
+    Args:
+        input_data (dict): The 'data' field of the request.
+        plyThicknessList (list): The ply thicknesses shown in the report.
+
+    Returns:
+        str: A hex digest identifying the request.
+    """
+    payload = json.dumps([input_data, list(plyThicknessList or [])], sort_keys=True, separators=(',', ':'),
+                         default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with an optional time to live and hit/miss counters.
+    """
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Held by callers while they update a cached value in place, e.g. attach its report job
+        self.entry_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """
+        Return the value stored under key, or None (counted as a miss) if it is absent or expired.
+        """
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and self.ttl and time.monotonic() - item[0] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                item = None
+
+            if item is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def put_if_absent(self, key, value):
+        """
+        Store value unless a live value is already stored under key.
+
+        Returns:
+            object: The value stored under key afterwards, the existing one if there was one.
+        """
+        if self.maxsize <= 0:
+            return value
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and not (self.ttl and time.monotonic() - item[0] > self.ttl):
+                self._entries.move_to_end(key)
+                return item[1]
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+# Calculations of /calculate and /calculate_batch, keyed by canonical_key
+results = ResultCache()
@@ -218,6 +218,26 @@ function gatherDataFromInput() {
     sendToServer(inputParams, plyThicknessList);
 }
 
+// Poll the report endpoint until the PDF is ready (202 while it is being rendered)
+function waitForReport(reportUrl, interval = 300) {
+    return new Promise((resolve, reject) => {
+        const poll = () => {
+            fetch(reportUrl, { method: 'HEAD' })
+                .then(response => {
+                    if (response.status === 202) {
+                        setTimeout(poll, interval);
+                    } else if (response.ok) {
+                        resolve();
+                    } else {
+                        reject(new Error('Report failed: ' + response.status));
+                    }
+                })
+                .catch(reject);
+        };
+        poll();
+    });
+}
+
 // Function to send data to the server
 function sendToServer(data, plyThicknessList) {
     const combinedData = { data, plyThicknessList };
@@ -237,14 +257,26 @@ function sendToServer(data, plyThicknessList) {
         // Display the formatted results
         document.getElementById('results').textContent = resultText;
 
-        const pdfLink = document.createElement('a');
-        pdfLink.href = result.pdf_url;
-        pdfLink.textContent = 'Download results as PDF';
-        pdfLink.target = '_blank';  // Open in a new tab
-
-        const resultsDiv = document.getElementById('results');
-        resultsDiv.appendChild(document.createElement('br'));
-        resultsDiv.appendChild(pdfLink);
+        // The report is rendered in the background, wait for it before offering the link
+        waitForReport(result.report_url)
+            .then(() => {
+                const pdfLink = document.createElement('a');
+                pdfLink.href = result.report_url;
+                pdfLink.textContent = 'Download results as PDF';
+                pdfLink.target = '_blank';  // Open in a new tab
+
+                const resultsDiv = document.getElementById('results');
+                resultsDiv.appendChild(document.createElement('br'));
+                resultsDiv.appendChild(pdfLink);
+            })
+            .catch(error => {
+                console.error('Error generating the report:', error);
+                // Keep the results already shown, only add the error below them
+                const reportError = document.createElement('div');
+                reportError.className = 'error-message';
+                reportError.textContent = 'The report could not be generated.';
+                document.getElementById('results').appendChild(reportError);
+            });
     })
     .catch(error => {
         console.error('Error sending data to the server:', error);
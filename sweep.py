@@ -0,0 +1,300 @@
+"""
+Parametric sweep of the center of glass deflection (COF), and optionally the NFL, over a grid of panels.
+
+    python sweep.py                                      # the COF design chart, to cof_results.csv
+    python sweep.py --sides 4 --loads 1:3:0.5 --lengths 1000:4500:500 --widths 700:2500:500
+    python sweep.py --nfl --output design_chart.parquet  # Parquet needs pyarrow
+    python sweep.py --workers 1                          # no worker processes, e.g. for debugging
+
+Ranges are declared as start:stop:step (stop excluded, like range()) or as a list of values. Options
+not given keep the per-sides defaults of DEFAULTS. The cartesian product is split into one shard per
+(sides, layer type, thickness, load); the shards are evaluated by a process pool with the vectorized
+paths (calculate_cof_array/calculate_nfl_batch for 4-sided panels, evaluate_1_2_sided for 1- and 2-sided
+panels), and written in order as they complete.
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import functools
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+MODULUS_OF_ELASTICITY = 71700000
+
+THICKNESSES_4_SIDED = [2.5, 2.7, 3.0, 4.0, 5.0, 6.0, 8.0, 10.0, 12.0, 16.0, 19.0, 22.0]
+THICKNESSES_1_2_SIDED = [6, 8, 10, 12, 16, 19, 22]
+
+# Grid per number of supported sides; 1-sided panels have no width
+DEFAULTS = {
+    1: {'lengths': list(range(1000, 2500, 500)), 'widths': [None], 'thicknesses': THICKNESSES_1_2_SIDED},
+    2: {'lengths': list(range(1000, 3500, 500)), 'widths': [1000], 'thicknesses': THICKNESSES_1_2_SIDED},
+    4: {'lengths': list(range(1000, 4500, 500)), 'widths': list(range(700, 2500, 500)),
+        'thicknesses': THICKNESSES_4_SIDED},
+}
+DEFAULT_LOADS = [1, 1.5, 2]
+DEFAULT_LAYER_TYPES = ['mono', 'laminated']
+# Rows with a COF from this value on are left out of the chart
+DEFAULT_MAX_COF = 50
+
+COLUMNS = ['Supported Sides', 'Load', 'Length', 'Width', 'Layer Type', 'Thickness', 'COF Value']
+NFL_COLUMN = 'NFL Value'
+
+
+def parse_values(text):
+    """
+    Parse a declared range: 'start:stop:step' (stop excluded) or a comma separated list of values.
+
+    Returns:
+        list: The values, as int where they are whole numbers.
+    """
+    if ':' in text:
+        start, stop, step = (float(part) for part in text.split(':'))
+        values = np.arange(start, stop - step * 1e-9, step).round(10).tolist()
+    else:
+        values = [float(part) for part in text.split(',') if part.strip()]
+    return [int(value) if float(value).is_integer() else value for value in values]
+
+
+def build_shards(sides, loads, layer_types, interlayer='PVB', lengths=None, widths=None, thicknesses=None,
+                 nfl=False, max_cof=DEFAULT_MAX_COF):
+    """
+    Split the cartesian product of the sweep into shards of one (sides, layer type, thickness, load).
+
+    Args:
+        sides (list): Numbers of supported sides (1, 2 or 4).
+        loads (list): Loads in kPa.
+        layer_types (list): "mono" and/or "laminated".
+        interlayer (str): "PVB" or "SGP".
+        lengths, widths, thicknesses (list, optional): Override the DEFAULTS of every number of sides.
+        nfl (bool): Also calculate the NFL.
+        max_cof (float): Only keep the rows with a COF below this value.
+
+    Returns:
+        list: The shards, as dicts passed to evaluate_shard.
+    """
+    shards = []
+    for supported_sides in sides:
+        defaults = DEFAULTS[supported_sides]
+        for layer_type, thickness, load in itertools.product(layer_types, thicknesses or defaults['thicknesses'],
+                                                             loads):
+            shards.append({
+                'sides': supported_sides,
+                'layer_type': layer_type,
+                'thickness': thickness,
+                'load': load,
+                'lengths': lengths or defaults['lengths'],
+                'widths': [None] if supported_sides == 1 else (widths or defaults['widths']),
+                'interlayer': interlayer,
+                'nfl': nfl,
+                'max_cof': max_cof,
+            })
+    return shards
+
+
+def _evaluate_4_sided(shard, lengths, widths):
+    from cof_calculation import calculate_cof_array
+    from nfl_calculation import calculate_nfl_batch
+
+    cof, valid = calculate_cof_array(shard['load'], lengths, widths, MODULUS_OF_ELASTICITY, shard['thickness'],
+                                     [shard['interlayer']])
+    cof = np.round(cof, 2)
+    nfl = None
+    if shard['nfl']:
+        try:
+            nfl = np.round(calculate_nfl_batch(lengths, widths, 4, f"{float(shard['thickness']):g}",
+                                               shard['layer_type']), 5)
+        except (ValueError, FileNotFoundError):
+            # No chart for this build-up
+            nfl = np.full(len(lengths), np.nan)
+    return cof, valid, nfl
+
+
+def _evaluate_1_2_sided(shard, lengths):
+    from NFL_COF_1and2Sided import evaluate_1_2_sided
+
+    def evaluate(nfl_or_cof):
+        try:
+            return evaluate_1_2_sided(shard['thickness'], lengths, shard['layer_type'], shard['sides'], nfl_or_cof,
+                                      shard['load'], [shard['interlayer']])
+        except ValueError:
+            # No chart for this build-up
+            return np.full(len(lengths), np.nan)
+
+    cof = evaluate("COF")
+    nfl = evaluate("NFL") if shard['nfl'] else None
+    return cof, ~np.isnan(cof), nfl
+
+
+def evaluate_shard(shard):
+    """
+    Calculate the rows of one shard.
+
+    Returns:
+        dict: Column name -> array of values, only the rows with a valid COF below max_cof. Widths of
+              1-sided panels are NaN.
+    """
+    lengths, widths = (np.array(axis, dtype=float).ravel()
+                       for axis in np.meshgrid(np.array(shard['lengths'], dtype=float),
+                                               np.array([np.nan if width is None else width
+                                                         for width in shard['widths']], dtype=float),
+                                               indexing='ij'))
+    if shard['sides'] == 4:
+        cof, valid, nfl = _evaluate_4_sided(shard, lengths, widths)
+    else:
+        cof, valid, nfl = _evaluate_1_2_sided(shard, lengths)
+
+    keep = valid & (cof < shard['max_cof'])
+    count = int(keep.sum())
+    columns = {
+        'Supported Sides': np.full(count, shard['sides']),
+        'Load': np.full(count, shard['load']),
+        'Length': lengths[keep],
+        'Width': widths[keep],
+        'Layer Type': np.full(count, shard['layer_type']),
+        'Thickness': np.full(count, shard['thickness']),
+        'COF Value': cof[keep],
+    }
+    if nfl is not None:
+        columns[NFL_COLUMN] = nfl[keep]
+    return columns
+
+
+def _csv_text(values, whole_numbers=False):
+    # NaN is written as N/A, and sizes in whole mm without decimals, like the rows of test.py
+    if values.dtype.kind != 'f':
+        return values.astype(str)
+    missing = np.isnan(values)
+    text = values.astype(str)
+    if whole_numbers:
+        whole = ~missing & (values == np.round(values))
+        text[whole] = values[whole].astype(np.int64).astype(str)
+    text[missing] = 'N/A'
+    return text
+
+
+class CSVWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', newline='')
+        csv.writer(self.file).writerow(columns)
+
+    @staticmethod
+    def render(chunk):
+        """
+        Format a chunk as CSV text; runs in the worker processes, so the formatting is parallel too.
+        """
+        text = [_csv_text(values, whole_numbers=name in ('Length', 'Width')).tolist() for name, values in chunk.items()]
+        return len(chunk['COF Value']), ''.join(','.join(row) + '\r\n' for row in zip(*text))
+
+    def write(self, rendered):
+        self.file.write(rendered[1])
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    def __init__(self, path, columns):
+        # pyarrow is optional, only needed for Parquet output
+        import pyarrow
+        import pyarrow.parquet
+
+        self.pyarrow = pyarrow
+        types = {'Supported Sides': pyarrow.int64(), 'Layer Type': pyarrow.string()}
+        self.schema = pyarrow.schema([(name, types.get(name, pyarrow.float64())) for name in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    @staticmethod
+    def render(chunk):
+        return len(chunk['COF Value']), chunk
+
+    def write(self, rendered):
+        chunk = rendered[1]
+        # from_pandas turns the NaN widths of 1-sided panels into nulls
+        arrays = [self.pyarrow.array(chunk[field.name], type=field.type, from_pandas=True) for field in self.schema]
+        self.writer.write_table(self.pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def _evaluate_and_render(shard, render):
+    return render(evaluate_shard(shard))
+
+
+def open_writer(path, columns):
+    if path.endswith('.parquet'):
+        return ParquetWriter(path, columns)
+    return CSVWriter(path, columns)
+
+
+def run_sweep(shards, output, workers=None):
+    """
+    Evaluate the shards in a process pool and stream the rows to output (CSV, or Parquet for .parquet).
+
+    Args:
+        shards (list): From build_shards.
+        output (str): The output file.
+        workers (int, optional): Worker processes, the number of CPUs by default; 1 runs in this process.
+
+    Returns:
+        int: The number of rows written.
+    """
+    columns = COLUMNS + ([NFL_COLUMN] if shards and shards[0]['nfl'] else [])
+    writer = open_writer(output, columns)
+    rows = 0
+    try:
+        task = functools.partial(_evaluate_and_render, render=type(writer).render)
+        if workers == 1:
+            chunks = map(task, shards)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            chunks = executor.map(task, shards)
+        for rendered in chunks:
+            if rendered[0]:
+                writer.write(rendered)
+                rows += rendered[0]
+        if executor is not None:
+            executor.shutdown()
+    finally:
+        writer.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep the COF (and NFL) over a grid of panels.")
+    parser.add_argument('--sides', type=int, nargs='+', choices=sorted(DEFAULTS), default=sorted(DEFAULTS),
+                        help="numbers of supported sides (default 1 2 4)")
+    parser.add_argument('--loads', type=parse_values, default=DEFAULT_LOADS, help="loads in kPa (default 1,1.5,2)")
+    parser.add_argument('--lengths', type=parse_values, help="lengths in mm, e.g. 1000:4500:500")
+    parser.add_argument('--widths', type=parse_values, help="widths in mm of 2- and 4-sided panels")
+    parser.add_argument('--thicknesses', type=parse_values, help="nominal thicknesses in mm")
+    parser.add_argument('--layer-types', nargs='+', choices=DEFAULT_LAYER_TYPES, default=DEFAULT_LAYER_TYPES)
+    parser.add_argument('--interlayer', choices=['PVB', 'SGP'], default='PVB')
+    parser.add_argument('--nfl', action='store_true', help="also calculate the NFL")
+    parser.add_argument('--max-cof', type=float, default=DEFAULT_MAX_COF,
+                        help=f"leave out rows with a COF from this value on (default {DEFAULT_MAX_COF})")
+    parser.add_argument('--workers', type=int, help="worker processes (default: number of CPUs)")
+    parser.add_argument('--output', default='cof_results.csv', help="CSV file, or Parquet if it ends in .parquet")
+    args = parser.parse_args(argv)
+
+    shards = build_shards(args.sides, args.loads, args.layer_types, interlayer=args.interlayer,
+                          lengths=args.lengths, widths=args.widths, thicknesses=args.thicknesses,
+                          nfl=args.nfl, max_cof=args.max_cof)
+    start = time.perf_counter()
+    try:
+        rows = run_sweep(shards, args.output, workers=args.workers)
+    except ImportError as e:
+        print(f"Parquet output needs pyarrow: {e}")
+        return 1
+    print(f"Total calculations: {rows} rows written to {args.output} in {time.perf_counter() - start:.2f} s")
+    return 0
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.exit(main())
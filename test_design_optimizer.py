@@ -0,0 +1,9 @@
+from design_optimizer import optimize_design
+
+
+def test_swapped_dimensions_give_the_same_candidates():
+    for short_load, long_load in ((2.0, 0), (1.5, 0.5)):
+        portrait = optimize_design(1200, 2400, short_load, long_load)
+        landscape = optimize_design(2400, 1200, short_load, long_load)
+        assert portrait == landscape
+        assert portrait['candidates']
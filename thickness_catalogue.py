@@ -0,0 +1,153 @@
+import bisect
+
+import numpy as np
+
+import chart_registry
+import timing
+
+# Define the glass thickness and corresponding weight (in kg/m²) based on the first table
+GLASS_WEIGHT_MAP = {
+    2.5: 5.7,
+    3.0: 7.6,
+    4.0: 9.9,
+    5.0: 11.9,
+    6.0: 14.6,
+    8.0: 19.5,
+    10.0: 24.4,
+    12.0: 31.2,
+    16.0: 39.5,
+    19.0: 47.8,
+    20.0: 50.19
+}
+
+# Define the interlayer thickness and corresponding weight (in kg/m²) based on the second table
+INTERLAYER_WEIGHT_MAP = {
+    0.38: 0.40,
+    0.76: 0.84,
+    1.14: 1.20,
+    1.52: 1.60,
+    1.524: 1.6,
+    2.29: 2.50
+}
+
+
+class SortedTable:
+    """
+    Thickness -> value table held as sorted keys, looked up by bisection instead of a scan.
+
+    Attributes:
+        keys (np.ndarray): The sorted thicknesses.
+        values (np.ndarray): The value of every key.
+    """
+
+    def __init__(self, pairs):
+        pairs = sorted((float(key), float(value)) for key, value in pairs)
+        self._keys = [key for key, _ in pairs]
+        self._values = [value for _, value in pairs]
+        self.keys = np.array(self._keys, dtype=float)
+        self.values = np.array(self._values, dtype=float)
+
+    def exact(self, key):
+        """
+        Return the value of key, or None if key is not in the table.
+        """
+        index = bisect.bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            return self._values[index]
+        return None
+
+    def closest(self, key):
+        """
+        Return the value of the key closest to key; of two equally close keys the smaller one.
+        """
+        index = bisect.bisect_left(self._keys, key)
+        if index == len(self._keys) or (index > 0 and key - self._keys[index - 1] <= self._keys[index] - key):
+            index -= 1
+        return self._values[index]
+
+    def exact_array(self, keys):
+        """
+        Vectorized form of exact().
+
+        Returns:
+            np.ndarray: The values, NaN where the key is not in the table.
+        """
+        keys = np.asarray(keys, dtype=float)
+        index = np.clip(np.searchsorted(self.keys, keys), 0, len(self.keys) - 1)
+        return np.where(self.keys[index] == keys, self.values[index], np.nan)
+
+    def closest_array(self, keys):
+        """
+        Vectorized form of closest().
+        """
+        keys = np.asarray(keys, dtype=float)
+        # NaN gets the first key, as the min() over the keys used to give it
+        index = np.where(np.isnan(keys), 0, np.searchsorted(self.keys, keys))
+        upper = np.minimum(index, len(self.keys) - 1)
+        lower = np.maximum(index - 1, 0)
+        use_lower = (index == len(self.keys)) | ((index > 0) & (keys - self.keys[lower] <= self.keys[upper] - keys))
+        return self.values[np.where(use_lower, lower, upper)]
+
+
+GLASS_WEIGHTS = SortedTable(GLASS_WEIGHT_MAP.items())
+INTERLAYER_WEIGHTS = SortedTable(INTERLAYER_WEIGHT_MAP.items())
+
+
+def build_minimum_thickness_table(spec_data):
+    """
+    Build the nominal -> minimum thickness table of the data of Glass_Thicknesses.json.
+    """
+    return SortedTable((glass["Nominal_mm"], glass["Minimum_mm"]) for glass in spec_data["Glass_Thicknesses"])
+
+
+def get_minimum_thickness_table(json_file_path):
+    """
+    Get the nominal -> minimum thickness table, built once per version of the file.
+    """
+    return chart_registry.registry.derived(json_file_path, 'minimum_thickness_table', build_minimum_thickness_table)
+
+
+def _lookup_with_fallback(table, thickness, miss_counter):
+    weight = table.exact(thickness)
+    if weight is None:
+        # Off-table thicknesses use the closest listed one
+        timing.increment(miss_counter)
+        weight = table.closest(thickness)
+    return weight
+
+
+def glass_weight_per_m2(thickness):
+    """
+    Weight of a glass layer in kg/m², of the closest listed thickness if this one is not listed.
+    """
+    return _lookup_with_fallback(GLASS_WEIGHTS, thickness, 'glass_weight_misses')
+
+
+def interlayer_weight_per_m2(thickness):
+    """
+    Weight of an interlayer in kg/m², of the closest listed thickness if this one is not listed.
+    """
+    return _lookup_with_fallback(INTERLAYER_WEIGHTS, thickness, 'interlayer_weight_misses')
+
+
+def _lookup_array_with_fallback(table, thicknesses, miss_counter):
+    weights = table.exact_array(thicknesses)
+    missing = np.isnan(weights)
+    if missing.any():
+        timing.increment(miss_counter, int(missing.sum()))
+        weights[missing] = table.closest_array(np.asarray(thicknesses, dtype=float)[missing])
+    return weights
+
+
+def glass_weight_per_m2_array(thicknesses):
+    """
+    Vectorized form of glass_weight_per_m2.
+    """
+    return _lookup_array_with_fallback(GLASS_WEIGHTS, thicknesses, 'glass_weight_misses')
+
+
+def interlayer_weight_per_m2_array(thicknesses):
+    """
+    Vectorized form of interlayer_weight_per_m2.
+    """
+    return _lookup_array_with_fallback(INTERLAYER_WEIGHTS, thicknesses, 'interlayer_weight_misses')
@@ -0,0 +1,165 @@
+import os
+import time
+import threading
+import contextlib
+import contextvars
+from collections import OrderedDict
+
+# Per-stage timing: spans collected per request, sent as a Server-Timing header and a log line
+TIMING_ENABLED = os.environ.get('TIMING', '').lower() in ('1', 'true', 'yes')
+# Prometheus-style histograms of the spans on /metrics
+METRICS_ENABLED = os.environ.get('METRICS', '').lower() in ('1', 'true', 'yes')
+
+# Upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL_SPAN = contextlib.nullcontext()
+_request_spans = contextvars.ContextVar('request_spans', default=None)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus exposition format.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            self.count += 1
+            self.sum += value
+
+    def samples(self):
+        """
+        Return the cumulative bucket counts, the total count and the sum.
+        """
+        with self._lock:
+            cumulative = []
+            total = 0
+            for bound, count in zip(self.buckets, self.counts):
+                total += count
+                cumulative.append((bound, total))
+            return cumulative, self.count, self.sum
+
+
+_histograms = OrderedDict()
+_histograms_lock = threading.Lock()
+
+
+def _histogram(name):
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(name, Histogram())
+    return histogram
+
+
+_counters = OrderedDict()
+_counters_lock = threading.Lock()
+
+
+def increment(name, amount=1):
+    """
+    Add to a counter on /metrics, e.g. the lookups that missed a table. A no-op when metrics are disabled.
+    """
+    if METRICS_ENABLED:
+        with _counters_lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+
+def enabled():
+    return TIMING_ENABLED or METRICS_ENABLED
+
+
+def record(name, duration):
+    """
+    Record a finished span of duration seconds.
+    """
+    spans = _request_spans.get()
+    if spans is not None:
+        spans[name] = spans.get(name, 0.0) + duration
+    if METRICS_ENABLED:
+        _histogram(name).observe(duration)
+
+
+@contextlib.contextmanager
+def _span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def span(name):
+    """
+    Time a block of code: ``with timing.span('cof'): ...``.
+
+    The time is added to the spans of the current request and to the histogram of the span.
+    When timing and metrics are both disabled this returns a shared no-op context manager.
+    """
+    if not (TIMING_ENABLED or METRICS_ENABLED):
+        return _NULL_SPAN
+    return _span(name)
+
+
+def start_request():
+    """
+    Start collecting the spans of a request in the current context.
+
+    Returns:
+        contextvars.Token: Passed to finish_request().
+    """
+    return _request_spans.set(OrderedDict())
+
+
+def finish_request(token):
+    """
+    Stop collecting spans for the request started with token.
+
+    Returns:
+        OrderedDict: Span name -> total seconds, in the order the spans first finished.
+    """
+    spans = _request_spans.get()
+    _request_spans.reset(token)
+    return spans or OrderedDict()
+
+
+def server_timing_header(spans):
+    """
+    Format spans as a Server-Timing header value (durations in milliseconds).
+    """
+    return ', '.join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in spans.items())
+
+
+def render_metrics(prefix='gwl'):
+    """
+    Render every histogram and counter in the Prometheus text exposition format.
+    """
+    metric = f"{prefix}_stage_duration_seconds"
+    lines = [f"# HELP {metric} Duration of the calculation stages.", f"# TYPE {metric} histogram"]
+    with _histograms_lock:
+        histograms = list(_histograms.items())
+
+    for name, histogram in histograms:
+        buckets, count, total = histogram.samples()
+        for bound, cumulative in buckets:
+            lines.append(f'{metric}_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{stage="{name}",le="+Inf"}} {count}')
+        lines.append(f'{metric}_sum{{stage="{name}"}} {total}')
+        lines.append(f'{metric}_count{{stage="{name}"}} {count}')
+
+    with _counters_lock:
+        counters = list(_counters.items())
+    for name, value in counters:
+        lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+    return '\n'.join(lines) + '\n'